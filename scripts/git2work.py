@@ -3,37 +3,53 @@
 import os
 import sys
 import subprocess
+import tempfile
+import codecs
+import time
 import argparse
 import re
+import io
 import json
+import hashlib
+import importlib.util
+import asyncio
+import sqlite3
+import queue
+import heapq
+import bisect
+import weakref
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from collections import defaultdict
-from typing import Dict, List, Optional, Tuple
-from git import Repo
+from functools import lru_cache
+from itertools import accumulate, chain
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 from datetime import datetime, timedelta, timezone
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI, OpenAI
 # API Keys - 仅从环境变量读取，不提供默认值以确保安全
 DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
 GITEE_TOKEN = os.getenv("GITEE_TOKEN")
+# openai 包导入耗时较长（数百毫秒），这里只检查是否安装，真正用到时（--add-summary）才导入
+OPENAI_AVAILABLE = importlib.util.find_spec("openai") is not None
+if not OPENAI_AVAILABLE:
+    print("Warning: openai package not installed. Please run: pip install openai")
 try:
-    from openai import OpenAI
-    OPENAI_AVAILABLE = True
+    import orjson
+    ORJSON_AVAILABLE = True
 except ImportError:
-    OPENAI_AVAILABLE = False
-    print("Warning: openai package not installed. Please run: pip install openai")
+    ORJSON_AVAILABLE = False  # 可选加速依赖，缺失时使用标准库 json
 try:
-    from github import Github
-    try:
-        from github import Auth
-        GITHUB_AUTH_AVAILABLE = True
-    except ImportError:
-        GITHUB_AUTH_AVAILABLE = False  # 旧版本 PyGithub
-    GITHUB_AVAILABLE = True
+    import numpy as np
+    NUMPY_AVAILABLE = True
 except ImportError:
-    GITHUB_AVAILABLE = False
-    GITHUB_AUTH_AVAILABLE = False
-    print("Warning: PyGithub package not installed. Please run: pip install PyGithub")
+    NUMPY_AVAILABLE = False  # 可选加速依赖，缺失时使用纯 Python 实现
+# 可选依赖，仅在设置 --max-context-tokens 时才导入；缺失时按 UTF-8 字节数估算 token 数
+TIKTOKEN_AVAILABLE = importlib.util.find_spec("tiktoken") is not None
 
 
 # 默认系统提示词
@@ -61,6 +77,10 @@ default_system_prompt = """你是一个专业的技术文档撰写助手。根
 
 请根据提供的 commit 信息生成工作总结。"""
 
+# 未指定 system prompt 时追加在默认提示词后的按项目估时要求；默认 system_msg 只拼接一次，各 provider 共用
+_MULTI_HINT = "\n此外，请按项目分别估算投入时间（根据提交时间密度与连续性），并给出每个项目的主要产出。"
+_DEFAULT_SYSTEM_MSG = default_system_prompt + _MULTI_HINT
+
 PEI="""\n\n最后计算一下效率指数（PEI）：
         设：
 * $N_c$ = 当日提交次数
@@ -90,9 +110,121 @@ $$
 | ≥10   | 🧠 卓越 | 自动化、生成式任务、集中攻坚 |
         """
 
+def _git(repo_path: str, *args: str, stdin_text: Optional[str] = None) -> str:
+    """
+    在 repo_path 中直接执行 git 命令并返回 stdout（UTF-8 解码一次，去掉末尾一个换行）。
+    不经过 GitPython：省去 Repo 初始化与命令分发开销，子进程调用本身也是线程安全的。
+    stdin_text 用于 `--stdin` 一类参数（如批量传入 sha）。
+    """
+    proc = subprocess.run(
+        ['git', '-C', repo_path, *args],
+        input=stdin_text.encode('utf-8') if stdin_text is not None else None,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE
+    )
+    if proc.returncode != 0:
+        stderr = proc.stderr.decode('utf-8', errors='replace').strip()
+        raise RuntimeError(f"git {args[0]} 执行失败 ({repo_path}): {stderr}")
+    out = proc.stdout
+    if out.endswith(b'\n'):
+        out = out[:-1]
+    return out.decode('utf-8', errors='replace')
+
+# 流式读取 git 输出时每次读取的字节数
+GIT_READ_CHUNK = 1 << 16
+
+def _git_records(repo_path: str, *args: str, stdin_text: Optional[str] = None, sep: str = '\x1e') -> Iterator[str]:
+    """
+    与 _git 相同的调用方式，但通过 Popen 流式读取 stdout，按 sep 切分后逐条产出记录，
+    不在内存中保留完整输出（大仓库的 git log 可达数十 MB）。git 失败时在读取结束后抛出 RuntimeError。
+    """
+    with tempfile.TemporaryFile() as err:
+        # stderr 写入临时文件：边读 stdout 边等待时不会因 stderr 管道写满而死锁
+        proc = subprocess.Popen(
+            ['git', '-C', repo_path, *args],
+            stdin=subprocess.PIPE if stdin_text is not None else subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=err
+        )
+        try:
+            if stdin_text is not None:
+                # `--stdin` 会先读完全部输入再开始输出，一次写入后关闭即可
+                proc.stdin.write(stdin_text.encode('utf-8'))
+                proc.stdin.close()
+            decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+            pending = ''
+            for chunk in iter(lambda: proc.stdout.read(GIT_READ_CHUNK), b''):
+                pending += decoder.decode(chunk)
+                *records, pending = pending.split(sep)
+                yield from records
+            yield pending + decoder.decode(b'', final=True)
+            if proc.wait() != 0:
+                err.seek(0)
+                stderr = err.read().decode('utf-8', errors='replace').strip()
+                raise RuntimeError(f"git {args[0]} 执行失败 ({repo_path}): {stderr}")
+        finally:
+            # 调用方提前停止迭代（或出错）时结束子进程
+            if proc.poll() is None:
+                proc.kill()
+            proc.stdout.close()
+            proc.wait()
+
+# GitHub GraphQL v4：一次请求同时取默认分支的提交历史与按更新时间倒序的 PR，各自用游标翻页
+GITHUB_GRAPHQL_URL = "https://api.github.com/graphql"
+_GITHUB_EVENTS_QUERY = """
+query($owner: String!, $name: String!, $since: GitTimestamp!, $until: GitTimestamp!,
+      $commitCursor: String, $prCursor: String, $withCommits: Boolean!, $withPRs: Boolean!) {
+  repository(owner: $owner, name: $name) {
+    defaultBranchRef {
+      target {
+        ... on Commit {
+          history(first: 100, since: $since, until: $until, after: $commitCursor) @include(if: $withCommits) {
+            pageInfo { hasNextPage endCursor }
+            nodes { oid messageHeadline author { name date user { login } } }
+          }
+        }
+      }
+    }
+    pullRequests(first: 100, orderBy: {field: UPDATED_AT, direction: DESC}, after: $prCursor) @include(if: $withPRs) {
+      pageInfo { hasNextPage endCursor }
+      nodes { number title updatedAt author { login } }
+    }
+  }
+}
+"""
+
+def _github_graphql(token: str, query: str, variables: Dict) -> Dict:
+    """
+    执行一次 GitHub GraphQL 查询并返回 data；HTTP 错误或 GraphQL errors 时抛出异常。
+    """
+    resp = _HTTP_SESSION.post(
+        GITHUB_GRAPHQL_URL,
+        headers={"Authorization": f"bearer {token}", "Content-Type": "application/json"},
+        data=_json_dumps_bytes({"query": query, "variables": variables}),
+        timeout=(10, 30)
+    )
+    if resp.status_code in (401, 403):
+        raise Exception(
+            f"GitHub API 拒绝访问（HTTP {resp.status_code}）。可能原因：\n"
+            f"1. 仓库是私有的，且 token 没有访问权限\n"
+            f"2. token 权限不足（需要 'repo' 权限来访问私有仓库）\n"
+            f"3. token 无效\n"
+            f"请检查 token 权限设置：https://github.com/settings/tokens"
+        )
+    resp.raise_for_status()
+    body = _json_loads(resp.content)
+    if body.get("errors"):
+        raise Exception("; ".join(err.get("message", str(err)) for err in body["errors"]))
+    return body.get("data") or {}
+
+def _parse_github_time(value: str) -> datetime:
+    # GraphQL 返回 ISO 8601（UTC 以 Z 结尾）
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).astimezone(timezone.utc)
+
 def get_github_events(repo_full_name: str, token: str, since_dt: datetime, until_dt: datetime) -> List[Dict]:
     """
     从 GitHub 获取指定时间范围内的 commits 和 PRs。
+    使用 GraphQL API：同一请求同时翻页提交历史与 PR，PR 按更新时间倒序，早于起始时间即停止翻页。
     
     Args:
         repo_full_name: 仓库全名，格式为 "OWNER/REPO"
@@ -112,107 +244,141 @@ def get_github_events(repo_full_name: str, token: str, since_dt: datetime, until
             "type": "commit" 或 "pr"
         }, ...]
     """
-    if not GITHUB_AVAILABLE:
-        raise ImportError("PyGithub 未安装，请运行: pip install PyGithub")
-    
-    events: List[Dict] = []
-    # 使用新的认证方式（避免 deprecation warning）
-    if GITHUB_AUTH_AVAILABLE:
-        auth = Auth.Token(token)
-        g = Github(auth=auth)
-    else:
-        # 旧版本 PyGithub，使用旧的方式
-        g = Github(token)
-    
-    try:
-        repo = g.get_repo(repo_full_name)
-    except Exception as e:
-        error_msg = str(e)
-        if "403" in error_msg or "Forbidden" in error_msg:
-            raise Exception(
-                f"无法访问仓库 {repo_full_name}。可能原因：\n"
-                f"1. 仓库是私有的，且 token 没有访问权限\n"
-                f"2. token 权限不足（需要 'repo' 权限来访问私有仓库）\n"
-                f"3. 仓库不存在或 token 无效\n"
-                f"请检查 token 权限设置：https://github.com/settings/tokens"
-            )
-        raise
+    owner, _, name = repo_full_name.partition("/")
+    if not owner or not name:
+        raise ValueError(f"GitHub 仓库名格式应为 OWNER/REPO: {repo_full_name}")
     
     # 确保时区为 UTC
     since_utc = since_dt.replace(tzinfo=timezone.utc) if since_dt.tzinfo is None else since_dt.astimezone(timezone.utc)
     until_utc = until_dt.replace(tzinfo=timezone.utc) if until_dt.tzinfo is None else until_dt.astimezone(timezone.utc)
     
-    # 1) 获取 Commits
-    try:
-        commits_iter = repo.get_commits(since=since_utc, until=until_utc)
-        for c in commits_iter:
-            commit_date = c.commit.author.date
-            if commit_date.tzinfo is None:
-                commit_date = commit_date.replace(tzinfo=timezone.utc)
-            
-            # 只包含指定时间范围内的提交
-            if since_utc <= commit_date <= until_utc:
-                message = c.commit.message.splitlines()[0] if c.commit.message else ""
-                # 尝试获取作者名称：先尝试 name，再尝试 committer 的 login
-                author_name = getattr(c.commit.author, "name", None)
-                if not author_name:
-                    try:
-                        author_name = c.commit.committer.login if hasattr(c.commit.committer, "login") else "Unknown"
-                    except:
-                        author_name = "Unknown"
-                events.append({
-                    "sha": c.sha,
-                    "author_name": author_name or "Unknown",
-                    "author_email": "",  # GitHub API 通常不提供邮箱
-                    "date": commit_date.isoformat(),
-                    "date_epoch": int(commit_date.timestamp()),
-                    "message": message,
-                    "type": "commit"
-                })
-    except Exception as e:
-        error_msg = str(e)
-        if "403" in error_msg or "Forbidden" in error_msg:
-            print(f"Warning: 获取 GitHub 仓库 {repo_full_name} 的 commits 失败: 权限不足")
-            print(f"提示: 如果是私有仓库，请确保 token 具有 'repo' 权限")
-            print(f"提示: 如果是公开仓库，可能是 token 权限问题，或仓库不存在")
-        elif "404" in error_msg or "Not Found" in error_msg:
-            print(f"Warning: 获取 GitHub 仓库 {repo_full_name} 的 commits 失败: 仓库未找到")
-        else:
-            print(f"Warning: 获取 GitHub commits 失败: {e}")
-    
-    # 2) 获取 PRs（通过搜索接口，按 updated 时间范围）
-    try:
-        query = f"repo:{repo_full_name} is:pr updated:{since_utc.date()}..{until_utc.date()}"
-        for pr in g.search_issues(query=query):
-            pr_updated = pr.updated_at
-            if pr_updated.tzinfo is None:
-                pr_updated = pr_updated.replace(tzinfo=timezone.utc)
-            
-            # 检查是否在时间范围内
-            if since_utc <= pr_updated <= until_utc:
-                events.append({
-                    "sha": f"PR#{pr.number}",
-                    "author_name": pr.user.login if pr.user else "Unknown",
-                    "author_email": "",
-                    "date": pr_updated.isoformat(),
-                    "date_epoch": int(pr_updated.timestamp()),
-                    "message": pr.title,
-                    "type": "pr"
-                })
-    except Exception as e:
-        error_msg = str(e)
-        if "403" in error_msg or "Forbidden" in error_msg:
-            print(f"Warning: 获取 GitHub 仓库 {repo_full_name} 的 PRs 失败: 权限不足")
-            print(f"提示: 请确保 token 具有访问仓库的权限")
-        elif "404" in error_msg or "Not Found" in error_msg:
-            print(f"Warning: 获取 GitHub 仓库 {repo_full_name} 的 PRs 失败: 仓库未找到")
-        else:
-            print(f"Warning: 获取 GitHub PRs 失败: {e}")
+    events: List[Dict] = []
+    variables = {
+        "owner": owner,
+        "name": name,
+        "since": since_utc.isoformat(),
+        "until": until_utc.isoformat(),
+        "commitCursor": None,
+        "prCursor": None,
+        "withCommits": True,
+        "withPRs": True,
+    }
+    while variables["withCommits"] or variables["withPRs"]:
+        data = _github_graphql(token, _GITHUB_EVENTS_QUERY, variables)
+        repo = data.get("repository")
+        if repo is None:
+            raise Exception(f"仓库 {repo_full_name} 不存在或 token 无权访问")
+        
+        # 1) Commits（默认分支；空仓库没有 defaultBranchRef）
+        if variables["withCommits"]:
+            history = ((repo.get("defaultBranchRef") or {}).get("target") or {}).get("history")
+            if not history:
+                variables["withCommits"] = False
+            else:
+                for node in history["nodes"]:
+                    author = node.get("author") or {}
+                    if not author.get("date"):
+                        continue
+                    commit_date = _parse_github_time(author["date"])
+                    # 只包含指定时间范围内的提交
+                    if since_utc <= commit_date <= until_utc:
+                        # 作者名称：先取提交中的 name，再取关联 GitHub 用户的 login
+                        author_name = author.get("name") or (author.get("user") or {}).get("login")
+                        events.append({
+                            "sha": node["oid"],
+                            "author_name": author_name or "Unknown",
+                            "author_email": "",  # GitHub API 通常不提供邮箱
+                            "date": commit_date.isoformat(),
+                            "date_epoch": int(commit_date.timestamp()),
+                            "message": node.get("messageHeadline") or "",
+                            "type": "commit"
+                        })
+                page = history["pageInfo"]
+                variables["withCommits"] = page["hasNextPage"]
+                variables["commitCursor"] = page["endCursor"]
+        
+        # 2) PRs（按 updated 时间倒序，客户端过滤时间范围）
+        if variables["withPRs"]:
+            prs = repo.get("pullRequests")
+            reached_since = False
+            for node in prs["nodes"]:
+                pr_updated = _parse_github_time(node["updatedAt"])
+                if pr_updated < since_utc:
+                    reached_since = True
+                    break
+                if pr_updated <= until_utc:
+                    events.append({
+                        "sha": f"PR#{node['number']}",
+                        "author_name": (node.get("author") or {}).get("login") or "Unknown",
+                        "author_email": "",
+                        "date": pr_updated.isoformat(),
+                        "date_epoch": int(pr_updated.timestamp()),
+                        "message": node["title"],
+                        "type": "pr"
+                    })
+            page = prs["pageInfo"]
+            variables["withPRs"] = page["hasNextPage"] and not reached_since
+            variables["prCursor"] = page["endCursor"]
     
     # 按时间排序
     events.sort(key=lambda e: e["date_epoch"])
     return events
 
+# Gitee 列表接口每页条数（API 上限）与并发翻页的线程数
+GITEE_PER_PAGE = 100
+GITEE_PAGE_WORKERS = 8
+
+def _gitee_fetch_page(url: str, headers: Dict[str, str], params: Dict, page: int) -> Tuple[requests.Response, List[Dict]]:
+    resp = _HTTP_SESSION.get(url, headers=headers, params={**params, "per_page": GITEE_PER_PAGE, "page": page}, timeout=30)
+    resp.raise_for_status()
+    return resp, _json_loads(resp.content)
+
+def _gitee_pipelined_pages(url: str, headers: Dict[str, str], params: Dict, first_page: int = 1) -> Iterator[List[Dict]]:
+    """
+    从 first_page 起逐页产出数据，直到空页或某页不足 GITEE_PER_PAGE 条。
+    调用方处理当前页时，下一页已在后台线程中请求（流水线预取）；调用方提前停止迭代时最多浪费一次预取。
+    """
+    ex = ThreadPoolExecutor(max_workers=1)
+    try:
+        page = first_page
+        future = ex.submit(_gitee_fetch_page, url, headers, params, page)
+        while True:
+            _, data = future.result()
+            if not data:
+                return
+            if len(data) < GITEE_PER_PAGE:
+                yield data
+                return
+            page += 1
+            future = ex.submit(_gitee_fetch_page, url, headers, params, page)
+            yield data
+    finally:
+        # 不等待未消费的预取请求
+        ex.shutdown(wait=False, cancel_futures=True)
+
+def _gitee_get_pages(url: str, headers: Dict[str, str], params: Dict) -> Iterator[List[Dict]]:
+    """
+    按页序产出 Gitee 列表接口的各页数据。
+    第一页串行获取，从响应头 total_page / total_count 得到总页数后，其余页并发获取；
+    响应头缺失时逐页获取（预取下一页），直到某页不足 GITEE_PER_PAGE 条。
+    """
+    resp, data = _gitee_fetch_page(url, headers, params, 1)
+    yield data
+    if len(data) < GITEE_PER_PAGE:
+        return
+    total_pages = None
+    if resp.headers.get("total_page", "").isdigit():
+        total_pages = int(resp.headers["total_page"])
+    elif resp.headers.get("total_count", "").isdigit():
+        total_pages = -(-int(resp.headers["total_count"]) // GITEE_PER_PAGE)
+    if total_pages is None:
+        yield from _gitee_pipelined_pages(url, headers, params, first_page=2)
+        return
+    if total_pages > 1:
+        with ThreadPoolExecutor(max_workers=min(GITEE_PAGE_WORKERS, total_pages - 1)) as ex:
+            for _, data in ex.map(lambda page: _gitee_fetch_page(url, headers, params, page), range(2, total_pages + 1)):
+                yield data
+
 def get_gitee_events(repo_full_name: str, token: str, since_dt: datetime, until_dt: datetime) -> List[Dict]:
     """
     从 Gitee 获取指定时间范围内的 commits 和 PRs（MRs）。
@@ -241,21 +407,10 @@ def get_gitee_events(repo_full_name: str, token: str, since_dt: datetime, until_
         commits_url = f"{base_url}/repos/{owner}/{repo_name}/commits"
         params = {
             "since": since_utc.isoformat(),
-            "until": until_utc.isoformat(),
-            "per_page": 100,
-            "page": 1
+            "until": until_utc.isoformat()
         }
         
-        page = 1
-        while True:
-            params["page"] = page
-            resp = requests.get(commits_url, headers=headers, params=params, timeout=30)
-            resp.raise_for_status()
-            commits_data = resp.json()
-            
-            if not commits_data:
-                break
-            
+        for commits_data in _gitee_get_pages(commits_url, headers, params):
             for c in commits_data:
                 commit_date_str = c.get("commit", {}).get("author", {}).get("date", "")
                 if commit_date_str:
@@ -282,10 +437,6 @@ def get_gitee_events(repo_full_name: str, token: str, since_dt: datetime, until_
                     except Exception as e:
                         print(f"Warning: 解析 Gitee commit 时间失败: {e}")
                         continue
-            
-            if len(commits_data) < 100:
-                break
-            page += 1
     except Exception as e:
         print(f"Warning: 获取 Gitee commits 失败: {e}")
     
@@ -295,21 +446,13 @@ def get_gitee_events(repo_full_name: str, token: str, since_dt: datetime, until_
         params = {
             "state": "all",
             "sort": "updated",
-            "direction": "desc",
-            "per_page": 100,
-            "page": 1
+            "direction": "desc"
         }
         
-        page = 1
-        while True:
-            params["page"] = page
-            resp = requests.get(mrs_url, headers=headers, params=params, timeout=30)
-            resp.raise_for_status()
-            mrs_data = resp.json()
-            
-            if not mrs_data:
-                break
-            
+        # PR 按更新时间倒序并可提前退出，逐页获取；解析当前页时下一页已在预取
+        for mrs_data in _gitee_pipelined_pages(mrs_url, headers, params):
+            # 每条 PR 的 updated_at 只解析一次，顺便记录本页最早的更新时间
+            earliest_updated = None
             for mr in mrs_data:
                 updated_str = mr.get("updated_at", "")
                 if updated_str:
@@ -317,6 +460,8 @@ def get_gitee_events(repo_full_name: str, token: str, since_dt: datetime, until_
                         updated_date = datetime.fromisoformat(updated_str.replace("Z", "+00:00"))
                         if updated_date.tzinfo is None:
                             updated_date = updated_date.replace(tzinfo=timezone.utc)
+                        if earliest_updated is None or updated_date < earliest_updated:
+                            earliest_updated = updated_date
                         
                         # 只包含指定时间范围内的 PR
                         if since_utc <= updated_date <= until_utc:
@@ -334,20 +479,8 @@ def get_gitee_events(repo_full_name: str, token: str, since_dt: datetime, until_
                         continue
             
             # 如果最早的 PR 更新时间早于查询范围，可以提前退出
-            try:
-                earliest_updated = min(
-                    (datetime.fromisoformat(mr.get("updated_at", "").replace("Z", "+00:00")) 
-                     for mr in mrs_data if mr.get("updated_at")),
-                    default=None
-                )
-                if earliest_updated and earliest_updated < since_utc:
-                    break
-            except Exception:
-                pass  # 如果解析失败，继续下一页
-            
-            if len(mrs_data) < 100:
+            if earliest_updated and earliest_updated < since_utc:
                 break
-            page += 1
     except Exception as e:
         print(f"Warning: 获取 Gitee PRs 失败: {e}")
     
@@ -355,89 +488,247 @@ def get_gitee_events(repo_full_name: str, token: str, since_dt: datetime, until_
     events.sort(key=lambda e: e["date_epoch"])
     return events
 
-def parse_git_log(raw):
-    # 我们使用 git log 输出以 \x1e（record sep）分割 commit，以 \x1f 字段分割
+# git log 记录格式：记录之间以 \x1e 分隔，字段以 \x1f 分隔；格式由本模块固定，
+# 按 \x1e 切分后对每条记录做一次带 maxsplit 的 str.split（C 层实现，比逐条正则匹配快约 2.5 倍），字段数不符的片段直接跳过
+# parse_git_log：%H %an %ae %ad %at %s，记录以 \x1e 结尾
+_COMMIT_FIELDS = 6
+# parse_git_log_with_numstat：记录以 \x1e 开头，%B 之后的 \x1f 与下一个 \x1e 之间为 numstat 行
+_COMMIT_DETAIL_FIELDS = 8
+
+def parse_git_log(raw: Union[str, Iterable[str]]) -> List[Dict]:
+    # 我们使用 git log 输出以 \x1e（record sep）分割 commit，以 \x1f 字段分割（含 %at epoch）
+    # raw 为完整输出字符串，或 _git_records 逐条产出的记录
     commits = []
     if not raw:
         return commits
-    for entry in raw.strip("\x1e").split("\x1e"):
-        parts = entry.split("\x1f")
-        if len(parts) < 5:
+    for record in (raw.split('\x1e') if isinstance(raw, str) else raw):
+        parts = record.split('\x1f', _COMMIT_FIELDS - 1)
+        if len(parts) != _COMMIT_FIELDS:
             continue
-        # 支持两种格式：5字段(旧) 或 6字段(含 %at epoch)
-        if len(parts) >= 6:
-            sha, author_name, author_email, date_str, epoch_str, message = [p.strip() for p in parts[:6]]
-            date_epoch = int(epoch_str) if epoch_str.isdigit() else None
-        else:
-            sha, author_name, author_email, date_str, message = [p.strip() for p in parts[:5]]
-            date_epoch = None
+        sha, author_name, author_email, date_str, epoch_str, message = parts
+        # `--pretty=format:` 在记录之间插入换行，落在下一条记录的 sha 之前
+        sha = sha.lstrip('\n')
         # date_str 示例: 2025-10-20 12:34:56 +0800 （取决于 --date=iso）
         commits.append({
             "sha": sha,
             "author_name": author_name,
             "author_email": author_email,
             "date": date_str,
-            "date_epoch": date_epoch,
-            "message": message,
+            "date_epoch": int(epoch_str) if epoch_str else None,
+            "message": message.strip(),
         })
     return commits
 
-def get_commits_between(repo_path, since_dt, until_dt, max_count=None):
+def _author_filter_args(author: Optional[str]) -> List[str]:
+    """
+    把作者过滤下推到 git log：按固定字符串、忽略大小写匹配 "Name <email>"。
+    """
+    if not author:
+        return []
+    return [f'--author={author}', '--regexp-ignore-case', '--fixed-strings']
+
+def get_commits_between(repo_path, since_dt, until_dt, max_count=None, author=None):
     """
     since_dt / until_dt: python datetime（最好带时区或者是本地时间）
+    author: 可选，由 git 按作者姓名或邮箱过滤
     返回 commit 对象列表（可以转换为 dict）
     """
-    repo = Repo(repo_path)
-    # gitpython 没有直接参数用来筛选日期，所以使用 git directly via repo.git.log 更方便：
     since = since_dt.isoformat(sep=' ')
     until = until_dt.isoformat(sep=' ')
-    # 增加 %at（author epoch 秒）便于稳定时间统计
-    raw = repo.git.log(
+    # 增加 %at（author epoch 秒）便于稳定时间统计；流式逐条解析，不保留完整输出
+    records = _git_records(
+        repo_path, 'log',
         f'--since={since}',
         f'--until={until}',
+        *_author_filter_args(author),
+        # 按时间正序输出：后续按 epoch 的排序面对的基本是已排序输入，Timsort 近似线性
+        '--reverse',
         '--pretty=format:%H%x1f%an%x1f%ae%x1f%ad%x1f%at%x1f%s%x1e',
-        date='iso'
+        '--date=iso'
     )
     # 复用上面 parse 函数
-    return parse_git_log(raw)
+    return parse_git_log(records)
 
-def get_commit_numstat(repo_path: str, sha: str) -> Tuple[List[str], int, int]:
+def _parse_numstat_lines(lines) -> Tuple[List[str], int, int]:
     """
-    返回 (files, insertions, deletions)
-    通过 `git show --numstat` 解析每个 commit 修改的文件与增删行数。
+    解析 `--numstat` 输出行（add<TAB>del<TAB>path），返回 (files, insertions, deletions)。
     """
-    repo = Repo(repo_path)
-    # --pretty=tformat: 只输出文件变更（避免重复元信息）
-    output = repo.git.show(sha, '--numstat', '--pretty=tformat:')
     files: List[str] = []
     insertions_total = 0
     deletions_total = 0
-    for line in output.splitlines():
-        parts = line.split('\t')
+    append_file = files.append
+    for line in lines:
+        parts = line.split('\t', 2)
         if len(parts) == 3:
             add_str, del_str, path = parts
-            # 二进制文件会显示 '-'，此时计为 0
+            # 二进制文件显示为 '-'，计为 0；先比较字符串，避免为每个二进制文件抛出并捕获异常
             try:
-                add = int(add_str) if add_str.isdigit() else 0
+                if add_str != '-':
+                    insertions_total += int(add_str)
+                if del_str != '-':
+                    deletions_total += int(del_str)
             except ValueError:
-                add = 0
-            try:
-                dele = int(del_str) if del_str.isdigit() else 0
-            except ValueError:
-                dele = 0
-            insertions_total += add
-            deletions_total += dele
-            files.append(path)
+                pass
+            append_file(path)
     return files, insertions_total, deletions_total
 
+def get_commit_numstat(repo_path: str, sha: str) -> Tuple[List[str], int, int]:
+    """
+    返回 (files, insertions, deletions)
+    通过 `git show --numstat` 解析每个 commit 修改的文件与增删行数。
+    批量场景请使用 get_commits_with_details（单次 git log），此函数仅保留作单个 commit 查询。
+    """
+    # --pretty=tformat: 只输出文件变更（避免重复元信息）
+    output = _git(repo_path, 'show', sha, '--numstat', '--pretty=tformat:')
+    return _parse_numstat_lines(output.splitlines())
+
 def get_commit_body(repo_path: str, sha: str) -> str:
     """
     获取完整 commit message（含主题与正文）。
     """
-    repo = Repo(repo_path)
-    body = repo.git.show(sha, '-s', '--format=%B')
+    body = _git(repo_path, 'show', sha, '-s', '--format=%B')
     return body.strip('\n')
 
+def parse_git_log_with_numstat(raw: Union[str, Iterable[str]]) -> Tuple[List[Dict], Dict[str, Tuple[List[str], int, int, str]]]:
+    """
+    解析 get_commits_with_details 的 git log 输出（完整字符串，或 _git_records 逐条产出的记录）。
+    每个 commit 以 \x1e 开头，字段以 \x1f 分隔，完整正文 %B 之后再跟一个 \x1f，
+    其后直到下一个 \x1e 的内容即该 commit 的 numstat 行。
+
+    Returns:
+        (commits, details)：commits 与 parse_git_log 的结构一致，
+        details 为 sha -> (files, insertions, deletions, body)
+    """
+    commits: List[Dict] = []
+    details: Dict[str, Tuple[List[str], int, int, str]] = {}
+    if not raw:
+        return commits, details
+    for record in (raw.split('\x1e') if isinstance(raw, str) else raw):
+        parts = record.split('\x1f', _COMMIT_DETAIL_FIELDS - 1)
+        if len(parts) != _COMMIT_DETAIL_FIELDS:
+            continue
+        sha, author_name, author_email, date_str, epoch_str, message, body, numstat = parts
+        body = body.strip('\n')
+        commits.append({
+            "sha": sha,
+            "author_name": author_name,
+            "author_email": author_email,
+            "date": date_str,
+            "date_epoch": int(epoch_str) if epoch_str else None,
+            "message": message.strip(),
+        })
+        files, ins, dels = _parse_numstat_lines(numstat.splitlines())
+        details[sha] = (files, ins, dels, body)
+    return commits, details
+
+# commit 详情缓存（SQLite）：commit 内容由 sha 唯一确定，缓存条目永不过期，
+# 重复/增量运行时只需对新 commit 计算 numstat
+COMMIT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "git2work", "commits.sqlite")
+# git log 的详情格式：%B 之后的 \x1f 与下一个 \x1e 之间为 numstat 行，见 parse_git_log_with_numstat
+_DETAIL_PRETTY = '--pretty=format:%x1e%H%x1f%an%x1f%ae%x1f%ad%x1f%at%x1f%s%x1f%B%x1f'
+
+def _commit_cache_open() -> Optional[sqlite3.Connection]:
+    """
+    打开 commit 详情缓存；失败（如目录不可写）时返回 None，调用方退化为不使用缓存。
+    每次调用返回独立连接，便于在多线程扫描中使用。
+    """
+    try:
+        os.makedirs(os.path.dirname(COMMIT_CACHE_PATH), exist_ok=True)
+        conn = sqlite3.connect(COMMIT_CACHE_PATH, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS commit_details ("
+            "sha TEXT PRIMARY KEY, files TEXT NOT NULL, ins INTEGER NOT NULL, dels INTEGER NOT NULL, body TEXT NOT NULL)"
+        )
+        return conn
+    except (OSError, sqlite3.Error) as e:
+        print(f"Warning: 打开 commit 缓存失败，将不使用缓存: {e}")
+        return None
+
+def _commit_cache_get(conn: sqlite3.Connection, shas: List[str]) -> Dict[str, Tuple[List[str], int, int, str]]:
+    details: Dict[str, Tuple[List[str], int, int, str]] = {}
+    # 分批查询，避免超过 SQLite 的参数个数上限
+    for i in range(0, len(shas), 500):
+        batch = shas[i:i + 500]
+        placeholders = ",".join("?" * len(batch))
+        rows = conn.execute(f"SELECT sha, files, ins, dels, body FROM commit_details WHERE sha IN ({placeholders})", batch)
+        for sha, files_json, ins, dels, body in rows:
+            details[sha] = (json.loads(files_json), ins, dels, body)
+    return details
+
+def _commit_cache_put(conn: sqlite3.Connection, details: Dict[str, Tuple[List[str], int, int, str]]) -> None:
+    # 整批写入放在同一个事务中
+    with conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO commit_details (sha, files, ins, dels, body) VALUES (?, ?, ?, ?, ?)",
+            [(sha, json.dumps(files, ensure_ascii=False), ins, dels, body) for sha, (files, ins, dels, body) in details.items()]
+        )
+
+def get_commits_with_details(repo_path: str, since_dt: datetime, until_dt: datetime, use_cache: bool = True, author: Optional[str] = None) -> Tuple[List[Dict], Dict[str, Tuple[List[str], int, int, str]]]:
+    """
+    单次 `git log --numstat` 同时获取时间范围内的 commit 元信息、完整正文与文件变更统计，
+    代替逐个 commit 调用 get_commit_numstat / get_commit_body（2N 次子进程 -> 1 次）。
+
+    use_cache 为 True 时先用不含 diff 的 git log 取元信息，已缓存的 sha 直接读取 SQLite，
+    只对未缓存的 commit 通过 `git log --no-walk --stdin` 计算 numstat 并写回缓存。
+    author 非空时由 git 过滤作者，未匹配的 commit 不会计算 numstat。
+
+    Returns:
+        (commits, details)，见 parse_git_log_with_numstat
+    """
+    since = since_dt.isoformat(sep=' ')
+    until = until_dt.isoformat(sep=' ')
+    if not use_cache:
+        # --cc：merge commit 的 numstat 与 `git show` 默认行为保持一致；流式逐条解析
+        records = _git_records(
+            repo_path, 'log',
+            f'--since={since}',
+            f'--until={until}',
+            *_author_filter_args(author),
+            '--reverse',
+            '--cc',
+            '--numstat',
+            _DETAIL_PRETTY,
+            '--date=iso'
+        )
+        return parse_git_log_with_numstat(records)
+
+    commits = get_commits_between(repo_path, since_dt, until_dt, author=author)
+    if not commits:
+        return commits, {}
+    conn = _commit_cache_open()
+    try:
+        details = _commit_cache_get(conn, [c['sha'] for c in commits]) if conn else {}
+        misses = [c['sha'] for c in commits if c['sha'] not in details]
+        if misses:
+            records = _git_records(
+                repo_path, 'log',
+                '--no-walk=unsorted',
+                '--stdin',
+                '--cc',
+                '--numstat',
+                _DETAIL_PRETTY,
+                '--date=iso',
+                stdin_text="\n".join(misses) + "\n"
+            )
+            _, fresh = parse_git_log_with_numstat(records)
+            details.update(fresh)
+            if conn:
+                try:
+                    _commit_cache_put(conn, fresh)
+                except sqlite3.Error as e:
+                    print(f"Warning: 写入 commit 缓存失败: {e}")
+    finally:
+        if conn:
+            conn.close()
+    return commits, details
+
+# reflog 行解析：HEAD@{YYYY-MM-DD HH:MM:SS +TZ}: <operation>:
+_REFLOG_RE = re.compile(r'HEAD@\{([^\}]+)\}:\s*([^:]+):')
+# pull 相关操作通常包含这些关键词（子串匹配），但 checkout/commit/reset 等操作需要排除
+_REFLOG_PULL_OP_RE = re.compile(r'pull|fetch|merge|update|rebase')
+_REFLOG_EXCLUDED_OP_RE = re.compile(r'checkout|commit|reset|branch|switch')
+
 def get_pull_operations(repo_path: str, since_dt: datetime, until_dt: datetime) -> List[datetime]:
     """
     获取指定时间范围内的 git pull/fetch 操作时间。
@@ -454,8 +745,6 @@ def get_pull_operations(repo_path: str, since_dt: datetime, until_dt: datetime)
         pull 操作时间列表（按时间排序）
     """
     try:
-        repo = Repo(repo_path)
-        
         since_iso = since_dt.isoformat(sep=' ')
         until_iso = until_dt.isoformat(sep=' ')
         
@@ -463,7 +752,8 @@ def get_pull_operations(repo_path: str, since_dt: datetime, until_dt: datetime)
         try:
             # 尝试获取 reflog（某些仓库可能没有 reflog）
             # reflog 输出格式: <hash> HEAD@{2025-11-03 01:26:20 +0800}: pull: Fast-forward
-            reflog_output = repo.git.reflog(
+            reflog_output = _git(
+                repo_path, 'reflog',
                 '--date=iso',
                 f'--since={since_iso}',
                 f'--until={until_iso}'
@@ -476,43 +766,27 @@ def get_pull_operations(repo_path: str, since_dt: datetime, until_dt: datetime)
             return []
         
         pull_times: List[datetime] = []
+        # 比较用的本地时间边界在循环外只计算一次
+        since_local = since_dt.replace(tzinfo=None) if since_dt.tzinfo else since_dt
+        until_local = until_dt.replace(tzinfo=None) if until_dt.tzinfo else until_dt
         
         # 解析 reflog 输出
         # 格式: <hash> HEAD@{<timestamp>}: <operation>: <message>
         # 示例: 9bef194 HEAD@{2025-11-03 01:26:20 +0800}: pull: Fast-forward
         for line in reflog_output.splitlines():
-            if not line.strip():
-                continue
-            
-            # 使用正则表达式提取时间戳和操作信息
-            # 匹配格式: HEAD@{YYYY-MM-DD HH:MM:SS +TZ}: <operation>:
-            match = re.search(r'HEAD@\{([^\}]+)\}:\s*([^:]+):', line)
+            match = _REFLOG_RE.search(line)
             if match:
-                date_str = match.group(1).strip()
                 operation = match.group(2).strip().lower()
                 
-                # 检查是否是 pull/fetch 相关操作
-                # pull 通常包含 "pull", "fetch", "merge" 等关键词
-                is_pull_related = any(keyword in operation for keyword in [
-                    'pull', 'fetch', 'merge', 'update', 'rebase'
-                ])
-                
-                # 排除一些不相关的操作（如 checkout, commit, reset 等）
-                excluded_keywords = ['checkout', 'commit', 'reset', 'branch', 'switch']
-                if any(keyword in operation for keyword in excluded_keywords):
-                    is_pull_related = False
-                
-                if is_pull_related:
+                # 检查是否是 pull/fetch 相关操作，并排除不相关的操作（如 checkout, commit, reset 等）
+                if _REFLOG_PULL_OP_RE.search(operation) and not _REFLOG_EXCLUDED_OP_RE.search(operation):
                     try:
                         # 解析日期字符串（ISO 格式：2025-11-03 01:26:20 +0800）
-                        pull_time = datetime.strptime(date_str, "%Y-%m-%d %H:%M:%S %z")
+                        pull_time = datetime.strptime(match.group(1).strip(), "%Y-%m-%d %H:%M:%S %z")
                         # 转换为本地时间（去掉时区信息以便比较）
                         pull_time = pull_time.astimezone().replace(tzinfo=None)
                         
                         # 确保在时间范围内
-                        since_local = since_dt.replace(tzinfo=None) if since_dt.tzinfo else since_dt
-                        until_local = until_dt.replace(tzinfo=None) if until_dt.tzinfo else until_dt
-                        
                         if since_local <= pull_time <= until_local:
                             pull_times.append(pull_time)
                     except Exception as e:
@@ -528,15 +802,22 @@ def get_pull_operations(repo_path: str, since_dt: datetime, until_dt: datetime)
         print(f"Warning: 获取仓库 {repo_path} 的 pull 记录失败: {e}")
         return []
 
+def _commit_time_part(date_str: str) -> str:
+    """
+    返回日期字符串中的时间与时区部分（如 "12:34:56 +0800"）。
+    `--date=iso` 输出为定长的 "YYYY-MM-DD HH:MM:SS +ZZZZ"，直接切片；其他格式按空格拆分。
+    """
+    if len(date_str) == 25 and date_str[10] == ' ':
+        return date_str[11:]
+    return ' '.join(date_str.split(' ')[1:3]) if ' ' in date_str else date_str
+
 def group_commits_by_date(commits: List[Dict]) -> Dict[str, List[Dict]]:
     groups: Dict[str, List[Dict]] = defaultdict(list)
-    for c in commits:
+    # 整体按整数 epoch 稳定排序一次（缺失时由 commit_epoch 回退解析），再线性分组，各组天然有序（从早到晚）。
+    # 本地 git log 已按时间正序输出，Timsort 对已有序输入只需线性扫描；作者时间可能因 rebase 等乱序，因此保留排序
+    for c in sorted(commits, key=commit_epoch):
         # date 字符串形如 "2025-10-20 12:34:56 +0800"
-        date_part = c['date'].split(' ')[0]
-        groups[date_part].append(c)
-    # 对每组按时间排序（从早到晚）
-    for k in groups:
-        groups[k].sort(key=lambda x: x['date'])
+        groups[c['date'].split(' ', 1)[0]].append(c)
     return dict(sorted(groups.items(), key=lambda x: x[0]))
 
 def commit_time_dt(c: Dict) -> datetime:
@@ -555,10 +836,30 @@ def commit_time_dt(c: Dict) -> datetime:
         except Exception:
             return datetime.fromisoformat(ds.replace(' ', 'T').split(' +')[0])
 
+def commit_epoch(c: Dict) -> int:
+    """
+    返回 commit 的 epoch 秒；优先使用 date_epoch，缺失时回退到 commit_time_dt 解析。
+    """
+    if c.get('date_epoch'):
+        try:
+            return int(c['date_epoch'])
+        except Exception:
+            pass
+    return int(commit_time_dt(c).timestamp())
+
+def _session_breaks(ts_sorted: List[int], gap_seconds: int) -> List[int]:
+    """
+    返回已排序 epoch 序列中新会话起点的下标（相邻间隔超过 gap_seconds 处）。
+    """
+    return [i for i in range(1, len(ts_sorted)) if ts_sorted[i] - ts_sorted[i - 1] > gap_seconds]
+
 def compute_work_sessions(commits: List[Dict], gap_minutes: int = 60, pull_times: Optional[List[datetime]] = None) -> List[Dict]:
     """
     计算工作会话，支持使用 pull 时间作为会话开始时间。
     
+    时间统一使用 int64 epoch 秒排序与切分（安装 numpy 时使用 argsort/diff 向量化），
+    只在生成会话结果时转换回 datetime。
+    
     Args:
         commits: commit 列表
         gap_minutes: 会话间隔（分钟）
@@ -569,240 +870,536 @@ def compute_work_sessions(commits: List[Dict], gap_minutes: int = 60, pull_times
     """
     if not commits:
         return []
-    items = sorted(commits, key=lambda c: commit_time_dt(c))
-    sessions: List[Dict] = []
-    gap = timedelta(minutes=gap_minutes)
+    epochs = [commit_epoch(c) for c in commits]
+    gap_seconds = gap_minutes * 60
+    if NUMPY_AVAILABLE:
+        ts_arr = np.asarray(epochs, dtype=np.int64)
+        order_arr = np.argsort(ts_arr, kind='stable')
+        ts_arr = ts_arr[order_arr]
+        breaks = (np.flatnonzero(np.diff(ts_arr) > gap_seconds) + 1).tolist()
+        order = order_arr.tolist()
+        ts = ts_arr.tolist()
+    else:
+        order = sorted(range(len(epochs)), key=epochs.__getitem__)
+        ts = [epochs[i] for i in order]
+        breaks = _session_breaks(ts, gap_seconds)
     
     # 如果有 pull 记录，用于调整会话开始时间
     pull_times_sorted = sorted(pull_times) if pull_times else []
     
-    current = {
-        'start': commit_time_dt(items[0]),
-        'end': commit_time_dt(items[0]),
-        'commits': [items[0]],
-    }
-    
-    # 为第一个会话查找对应的 pull 时间
-    # 如果第一个 commit 之前有 pull 操作，且时间间隔合理（不超过 gap_minutes），使用 pull 时间作为开始
-    first_commit_time = commit_time_dt(items[0])
-    if pull_times_sorted:
-        # 查找第一个 commit 之前最近的 pull 操作
-        # 找到第一个在 commit 时间之前的 pull（如果有的话）
-        for pull_time in reversed(pull_times_sorted):
-            if pull_time <= first_commit_time:
-                # 检查时间间隔是否合理（pull 时间应该在 commit 之前，但不要相隔太久）
-                time_diff = (first_commit_time - pull_time).total_seconds() / 60
-                # 如果 pull 在 commit 之前且在合理范围内（比如 2 小时内），使用 pull 时间
-                if time_diff > 0 and time_diff <= 120:  # 2 小时内的 pull 视为有效
-                    current['start'] = pull_time
-                    break
-    
-    for c in items[1:]:
-        t = commit_time_dt(c)
-        if t - commit_time_dt(current['commits'][-1]) <= gap:
-            current['end'] = t
-            current['commits'].append(c)
-        else:
-            # 会话结束，计算时长
-            current['duration_minutes'] = max(1, int((current['end'] - current['start']).total_seconds() // 60))
-            sessions.append(current)
-            
-            # 开始新会话
-            current = {'start': t, 'end': t, 'commits': [c]}
-            
-            # 为新会话查找对应的 pull 时间
-            if pull_times_sorted:
-                # 查找这个 commit 之前最近的 pull 操作
-                for pull_time in reversed(pull_times_sorted):
-                    if pull_time <= t:
-                        time_diff = (t - pull_time).total_seconds() / 60
-                        if time_diff > 0 and time_diff <= 120:  # 2 小时内的 pull 视为有效
-                            current['start'] = pull_time
-                            break
-    
-    # 处理最后一个会话
-    current['duration_minutes'] = max(1, int((current['end'] - current['start']).total_seconds() // 60))
-    sessions.append(current)
+    sessions: List[Dict] = []
+    bounds = [0] + breaks + [len(ts)]
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        first_commit_time = datetime.fromtimestamp(ts[lo])
+        current = {
+            'start': first_commit_time,
+            'end': datetime.fromtimestamp(ts[hi - 1]),
+            'commits': [commits[i] for i in order[lo:hi]],
+        }
+        
+        # 为会话查找对应的 pull 时间
+        # 如果会话第一个 commit 之前有 pull 操作，且时间间隔合理，使用 pull 时间作为开始
+        # 二分查找严格早于该 commit 的最近一次 pull（与 commit 同一时刻的 pull 不算）
+        idx = bisect.bisect_left(pull_times_sorted, first_commit_time) - 1
+        if idx >= 0:
+            pull_time = pull_times_sorted[idx]
+            # 检查时间间隔是否合理（pull 时间应该在 commit 之前，但不要相隔太久）
+            time_diff = (first_commit_time - pull_time).total_seconds() / 60
+            if time_diff <= 120:  # 2 小时内的 pull 视为有效
+                current['start'] = pull_time
+        
+        # 会话结束，计算时长
+        current['duration_minutes'] = max(1, int((current['end'] - current['start']).total_seconds() // 60))
+        sessions.append(current)
     return sessions
 
-def compute_feature_windows(commits: List[Dict]) -> Dict[str, Dict]:
+# 功能窗口识别的 commit 类型前缀（Conventional Commits）
+_FEAT_TOKENS = frozenset({'feat', 'fix', 'docs', 'build', 'refactor', 'chore', 'perf', 'test'})
+
+def compute_feature_windows(commits: Iterable[Dict]) -> Dict[str, Dict]:
     # Group by leading token of commit message (e.g., feat, fix, docs, build, refactor)
-    windows: Dict[str, Dict] = {}
+    # 窗口边界用整数 epoch 比较，最后每个窗口只转换一次 datetime
+    windows: Dict[str, List[int]] = {}
     for c in commits:
         msg = c.get('message', '').strip()
-        token = msg.split(':', 1)[0].lower().split(' ')[0]
-        key = token if token in ['feat', 'fix', 'docs', 'build', 'refactor', 'chore', 'perf', 'test'] else 'other'
-        t = commit_time_dt(c)
+        token = msg.split(':', 1)[0].lower().split(' ', 1)[0]
+        key = token if token in _FEAT_TOKENS else 'other'
+        t = commit_epoch(c)
         w = windows.get(key)
         if not w:
-            windows[key] = {'start': t, 'end': t, 'count': 1}
+            windows[key] = [t, t, 1]
+        else:
+            if t < w[0]:
+                w[0] = t
+            if t > w[1]:
+                w[1] = t
+            w[2] += 1
+    return {
+        key: {'start': datetime.fromtimestamp(start), 'end': datetime.fromtimestamp(end), 'count': count}
+        for key, (start, end, count) in windows.items()
+    }
+
+# 事件数超过该阈值时才使用 numba 编译的扫描线；numba 导入与首次编译有固定开销，小数据纯 Python 更快
+NUMBA_MIN_EVENTS = 20000
+_PARALLEL_SWEEP_KERNEL: Optional[Callable] = None
+_PARALLEL_SWEEP_KERNEL_LOADED = False
+
+def _get_parallel_sweep_kernel() -> Optional[Callable]:
+    """
+    按需导入 numba 并编译扫描线内核（cache=True，编译结果缓存到磁盘）。
+    未安装 numba/numpy 或编译失败时返回 None，由调用方回退到纯 Python 实现。
+    """
+    global _PARALLEL_SWEEP_KERNEL, _PARALLEL_SWEEP_KERNEL_LOADED
+    if _PARALLEL_SWEEP_KERNEL_LOADED:
+        return _PARALLEL_SWEEP_KERNEL
+    _PARALLEL_SWEEP_KERNEL_LOADED = True
+    if not NUMPY_AVAILABLE:
+        return None
+    try:
+        import numba
+    except ImportError:
+        return None  # 可选加速依赖
+    try:
+        _PARALLEL_SWEEP_KERNEL = numba.njit(cache=True)(_parallel_sweep_kernel)
+    except Exception:
+        _PARALLEL_SWEEP_KERNEL = None
+    return _PARALLEL_SWEEP_KERNEL
+
+def _parallel_sweep_kernel(kinds, repo_ids, n_repos):
+    """
+    扫描线内核（供 numba 编译）：输入按 (时间, 类型) 排好序的事件，
+    返回每个并行时段的起止事件下标，以及各时段涉及项目的布尔矩阵。
+    """
+    n = kinds.shape[0]
+    active = np.zeros(n_repos, dtype=np.int64)
+    out_start = np.empty(n // 2 + 1, dtype=np.int64)
+    out_end = np.empty(n // 2 + 1, dtype=np.int64)
+    members = np.zeros((n // 2 + 1, n_repos), dtype=np.bool_)
+    n_active = 0
+    k = 0
+    in_overlap = False
+    for i in range(n):
+        r = repo_ids[i]
+        if kinds[i] == 0:
+            if active[r] == 0:
+                n_active += 1
+            active[r] += 1
+            if not in_overlap and n_active >= 2:
+                in_overlap = True
+                out_start[k] = i
+                for j in range(n_repos):
+                    members[k, j] = active[j] > 0
+            elif in_overlap:
+                members[k, r] = True
         else:
-            if t < w['start']:
-                w['start'] = t
-            if t > w['end']:
-                w['end'] = t
-            w['count'] += 1
-    return windows
+            active[r] -= 1
+            if active[r] == 0:
+                n_active -= 1
+            if in_overlap and n_active < 2:
+                out_end[k] = i
+                k += 1
+                in_overlap = False
+    return out_start[:k], out_end[:k], members[:k]
+
+def _detect_parallel_sessions_numba(kernel: Callable, repo_to_sessions: Dict[str, List[Dict]]) -> List[Dict]:
+    """
+    detect_parallel_sessions 的 numba 路径：项目名映射为整数、时间转为 int64 epoch 后调用内核。
+    """
+    # 项目名按字母序编号，内核输出的成员掩码按序展开即为排好序的项目列表
+    repo_names = sorted(repo_to_sessions)
+    counts = [len(repo_to_sessions[repo]) for repo in repo_names]
+    times = [t for repo in repo_names for sess in repo_to_sessions[repo] for t in (sess['start'], sess['end'])]
+    epochs = np.fromiter((t.timestamp() for t in times), dtype=np.float64, count=len(times)).astype(np.int64)
+    kinds = np.tile(np.array([0, 1], dtype=np.int8), sum(counts))
+    repo_ids = np.repeat(np.arange(len(repo_names), dtype=np.int64), [2 * n for n in counts])
+    # lexsort 稳定排序：先按时间，再让同一时刻的开始事件排在结束事件之前
+    order = np.lexsort((kinds, epochs))
+    starts, ends, members = kernel(kinds[order], repo_ids[order], len(repo_names))
+    parallel_periods: List[Dict] = []
+    for si, ei, mask in zip(order[starts].tolist(), order[ends].tolist(), members.tolist()):
+        start = times[si]
+        end = times[ei]
+        parallel_periods.append({
+            'start': start,
+            'end': end,
+            'repos': [name for name, m in zip(repo_names, mask) if m],
+            'duration_minutes': int((end - start).total_seconds() // 60)
+        })
+    return parallel_periods
 
 def detect_parallel_sessions(repo_to_sessions: Dict[str, List[Dict]]) -> List[Dict]:
     """
     检测跨项目的并行工作时段。
     返回重叠的时间段及其涉及的项目列表。
+
+    扫描线算法：把每个会话拆成 (start, +1) / (end, -1) 两个事件并排序一次，
+    线性扫描时维护各项目的活跃会话数；同时活跃的项目数 >= 2 的区间即为并行时段。
+    会话按闭区间处理（首尾相接也视为重叠），同一时刻先处理开始事件。
     """
     if len(repo_to_sessions) < 2:
         return []  # 单项目不需要检测并行
     
-    all_periods: List[Dict] = []
+    # 会话数量很大时使用 numba 编译的扫描线（可选依赖）
+    if 2 * sum(len(v) for v in repo_to_sessions.values()) >= NUMBA_MIN_EVENTS:
+        kernel = _get_parallel_sweep_kernel()
+        if kernel is not None:
+            return _detect_parallel_sessions_numba(kernel, repo_to_sessions)
+    
+    events: List[Tuple[datetime, int, str]] = []
     for repo, sessions in repo_to_sessions.items():
         for s in sessions:
-            all_periods.append({
-                'start': s['start'],
-                'end': s['end'],
-                'repo': repo,
-                'session': s
-            })
-    
-    if not all_periods:
+            events.append((s['start'], 0, repo))  # 0: 开始
+            events.append((s['end'], 1, repo))    # 1: 结束
+    if not events:
         return []
+    events.sort(key=lambda e: (e[0], e[1]))
     
-    # 合并重叠时段算法：按时间线扫描，合并连续或重叠的时段
-    all_periods.sort(key=lambda x: (x['start'], x['end']))
-    merged_overlaps: List[Dict] = []
-    
-    current_overlaps = []  # 当前正在重叠的时段组
+    active: Dict[str, int] = defaultdict(int)  # repo -> 活跃会话数
+    parallel_periods: List[Dict] = []
+    overlap_start: Optional[datetime] = None
+    overlap_repos: set = set()
     
-    for period in all_periods:
-        if not current_overlaps:
-            current_overlaps = [period]
-            continue
-        
-        # 检查当前时段是否与已有重叠组有时间重叠
-        can_merge = False
-        for existing in current_overlaps:
-            if not (period['end'] < existing['start'] or period['start'] > existing['end']):
-                can_merge = True
-                break
-        
-        if can_merge:
-            current_overlaps.append(period)
+    for t, kind, repo in events:
+        if kind == 0:
+            active[repo] += 1
+            if overlap_start is None and len(active) >= 2:
+                overlap_start = t
+                overlap_repos = set(active)
+            elif overlap_start is not None:
+                overlap_repos.add(repo)
         else:
-            # 结束当前重叠组，开始新的
-            if len(set(p['repo'] for p in current_overlaps)) > 1:
-                overlap_start = min(p['start'] for p in current_overlaps)
-                overlap_end = max(p['end'] for p in current_overlaps)
-                overlap_repos = sorted(set(p['repo'] for p in current_overlaps))
-                merged_overlaps.append({
+            active[repo] -= 1
+            if active[repo] == 0:
+                del active[repo]
+            if overlap_start is not None and len(active) < 2:
+                parallel_periods.append({
                     'start': overlap_start,
-                    'end': overlap_end,
-                    'repos': overlap_repos,
-                    'duration_minutes': int((overlap_end - overlap_start).total_seconds() // 60)
+                    'end': t,
+                    'repos': sorted(overlap_repos),
+                    'duration_minutes': int((t - overlap_start).total_seconds() // 60)
                 })
-            current_overlaps = [period]
-    
-    # 处理最后一组
-    if len(set(p['repo'] for p in current_overlaps)) > 1:
-        overlap_start = min(p['start'] for p in current_overlaps)
-        overlap_end = max(p['end'] for p in current_overlaps)
-        overlap_repos = sorted(set(p['repo'] for p in current_overlaps))
-        merged_overlaps.append({
-            'start': overlap_start,
-            'end': overlap_end,
-            'repos': overlap_repos,
-            'duration_minutes': int((overlap_end - overlap_start).total_seconds() // 60)
-        })
+                overlap_start = None
     
-    # 再次合并可能连续或部分重叠的时段
-    if not merged_overlaps:
-        return []
-    
-    final_merged: List[Dict] = []
-    merged_overlaps.sort(key=lambda x: (x['start'], x['end']))
-    
-    current = merged_overlaps[0]
-    for next_period in merged_overlaps[1:]:
-        # 如果时间有重叠或连续（间隔小于5分钟视为连续），且涉及相同项目，则合并
-        gap = (next_period['start'] - current['end']).total_seconds() / 60
-        if gap <= 5 or not (next_period['end'] < current['start'] or next_period['start'] > current['end']):
-            # 合并
-            current['start'] = min(current['start'], next_period['start'])
-            current['end'] = max(current['end'], next_period['end'])
-            current['repos'] = sorted(set(current['repos']) | set(next_period['repos']))
-            current['duration_minutes'] = int((current['end'] - current['start']).total_seconds() // 60)
-        else:
-            final_merged.append(current)
-            current = next_period
-    final_merged.append(current)
-    
-    return final_merged
+    return parallel_periods
 
-def build_commit_context_by_project(repo_to_grouped: Dict[str, Dict[str, List[Dict]]], repo_to_details: Dict[str, Dict[str, Tuple[List[str], int, int, str]]], gap_minutes: int = 60, repo_to_pull_times: Optional[Dict[str, List[datetime]]] = None) -> str:
-    lines: List[str] = []
-    
-    # 先计算所有项目的会话，用于检测并行工作
+def _parallel_overlap_checker(parallel_periods: List[Dict], repo_name: str) -> Callable[[Dict], bool]:
+    """
+    返回判断会话是否与 repo_name 参与的某个并行时段重叠（闭区间）的函数。
+    时段按开始时间排序并预计算前缀最大结束时间，每次查询二分 O(log P)，而不是逐个扫描全部时段。
+    """
+    periods = sorted((pp for pp in parallel_periods if repo_name in pp['repos']), key=lambda pp: pp['start'])
+    starts = [pp['start'] for pp in periods]
+    max_ends = list(accumulate((pp['end'] for pp in periods), max))
+
+    def is_parallel(s: Dict) -> bool:
+        # 开始时间不晚于会话结束的时段中，只要最晚的结束时间不早于会话开始即有重叠
+        i = bisect.bisect_right(starts, s['end'])
+        return i > 0 and max_ends[i - 1] >= s['start']
+    return is_parallel
+
+# 超出 token 预算时，被精简的较早提交保留的文件数
+COMPACT_MAX_FILES = 3
+
+def _build_single_project_context(grouped: Dict[str, List[Dict]], details: Dict[str, Tuple[List[str], int, int, str]], max_commits_per_day: Optional[int] = None, max_body_chars: Optional[int] = None, compact_before: Optional[int] = None) -> str:
+    """
+    构建单项目的 AI 总结上下文（OpenAI 与 DeepSeek 共用）。
+    max_commits_per_day: 每天最多列出的提交数，超出时保留变更行数最多的提交（保持时间顺序）
+    max_body_chars: 提交详细内容的最大字符数，超出部分截断
+    两者为 None 或 0 时不限制，用于控制提示词长度（以及 API 延迟与费用）。
+    compact_before: 提交时间戳早于该值的提交省略详细内容，文件列表只保留前 COMPACT_MAX_FILES 个（用于 token 预算）
+    """
+    buf = io.StringIO()
+    w = buf.write
+    empty_detail = ([], 0, 0, "")
+    for day, items in grouped.items():
+        w(f"\n## {day} ({len(items)} commits)\n")
+        shown = items
+        if max_commits_per_day and len(items) > max_commits_per_day:
+            def churn(c: Dict) -> int:
+                _, ins, dels, _ = details.get(c['sha'], empty_detail)
+                return ins + dels
+            keep = {id(c) for c in heapq.nlargest(max_commits_per_day, items, key=churn)}
+            shown = [c for c in items if id(c) in keep]
+        for c in shown:
+            sha = c['sha']
+            files, ins, dels, body = details.get(sha, empty_detail)
+            short_sha = sha[:8]
+            time_part = _commit_time_part(c['date'])
+            compact = compact_before is not None and commit_epoch(c) < compact_before
+            max_files = COMPACT_MAX_FILES if compact else 20
+            # 每个 commit 拼成一个字符串后只写入一次
+            block = (
+                f"\n- [{short_sha}] {time_part}\n"
+                f"  提交信息: {c['message']}\n"
+                f"  统计: {ins} 行新增, {dels} 行删除, {len(files)} 个文件\n"
+            )
+            if body and not compact and body.strip() != c['message']:
+                if max_body_chars and len(body) > max_body_chars:
+                    body = body[:max_body_chars] + "…"
+                block += f"  详细内容:\n{body}\n"
+            if files:
+                block += f"  修改的文件: {', '.join(files[:max_files])}{' ...' if len(files) > max_files else ''}\n"
+            w(block)
+        if len(shown) < len(items):
+            w(f"\n- ……另有 {len(items) - len(shown)} 个变更较小的提交未列出\n")
+    # 去掉最后一个换行，与逐行 "\n".join 的结果保持一致
+    return buf.getvalue()[:-1]
+
+def compute_repo_sessions(repo_to_grouped: Dict[str, Dict[str, List[Dict]]], gap_minutes: int = 60, repo_to_pull_times: Optional[Dict[str, List[datetime]]] = None) -> Dict[str, List[Dict]]:
+    """
+    计算每个项目的工作会话。
+    结果可在渲染与 AI 总结之间共享，避免重复计算会话与并行时段。
+    """
     repo_to_sessions: Dict[str, List[Dict]] = {}
     for repo_name, grouped in repo_to_grouped.items():
-        flat_commits: List[Dict] = []
-        for items in grouped.values():
-            flat_commits.extend(items)
         # 获取该仓库的 pull 时间（如果是本地仓库）
         pull_times = repo_to_pull_times.get(repo_name, []) if repo_to_pull_times else []
-        sessions = compute_work_sessions(flat_commits, gap_minutes, pull_times)
-        repo_to_sessions[repo_name] = sessions
+        repo_to_sessions[repo_name] = compute_work_sessions(list(chain.from_iterable(grouped.values())), gap_minutes, pull_times)
+    return repo_to_sessions
+
+def build_commit_context_by_project(repo_to_grouped: Dict[str, Dict[str, List[Dict]]], repo_to_details: Dict[str, Dict[str, Tuple[List[str], int, int, str]]], gap_minutes: int = 60, repo_to_pull_times: Optional[Dict[str, List[datetime]]] = None, repo_to_sessions: Optional[Dict[str, List[Dict]]] = None, parallel_periods: Optional[List[Dict]] = None, max_commits_per_day: Optional[int] = None, max_body_chars: Optional[int] = None, compact_before: Optional[int] = None) -> str:
+    buf = io.StringIO()
+    w = buf.write
+    
+    # 先计算所有项目的会话，用于检测并行工作（调用方已算好时直接复用）
+    if repo_to_sessions is None:
+        repo_to_sessions = compute_repo_sessions(repo_to_grouped, gap_minutes, repo_to_pull_times)
     
     # 检测跨项目并行工作时间
-    parallel_periods = detect_parallel_sessions(repo_to_sessions)
+    if parallel_periods is None:
+        parallel_periods = detect_parallel_sessions(repo_to_sessions)
     if parallel_periods:
-        lines.append("# 跨项目并行工作时间段")
+        w("# 跨项目并行工作时间段\n")
         total_parallel_minutes = sum(p['duration_minutes'] for p in parallel_periods)
-        lines.append(f"检测到 {len(parallel_periods)} 个并行工作时段，总重叠时长约 {total_parallel_minutes} 分钟")
+        w(f"检测到 {len(parallel_periods)} 个并行工作时段，总重叠时长约 {total_parallel_minutes} 分钟\n")
         for idx, p in enumerate(parallel_periods, 1):
             repos_str = ', '.join(p['repos'])
-            lines.append(f"- 并行时段{idx}: {p['start']} ~ {p['end']} ({p['duration_minutes']} 分钟, 涉及项目: {repos_str})")
-        lines.append("")
+            w(f"- 并行时段{idx}: {p['start']} ~ {p['end']} ({p['duration_minutes']} 分钟, 涉及项目: {repos_str})\n")
+        w("\n")
     
     # 各项目详细统计
     for repo_name, grouped in repo_to_grouped.items():
         if len(grouped) ==0:
             continue
-        lines.append(f"\n# 项目：{repo_name}")
+        w(f"\n# 项目：{repo_name}\n")
         sessions = repo_to_sessions[repo_name]
         if sessions:
             total_minutes = sum(s['duration_minutes'] for s in sessions)
-            lines.append(f"工作会话: {len(sessions)} 个，总时长约 {total_minutes} 分钟")
+            w(f"工作会话: {len(sessions)} 个，总时长约 {total_minutes} 分钟\n")
+            is_parallel = _parallel_overlap_checker(parallel_periods, repo_name)
             for idx, s in enumerate(sessions, 1):
                 # 标记是否为并行时段
-                is_parallel = any(
-                    not (s['end'] < pp['start'] or s['start'] > pp['end'])
-                    for pp in parallel_periods
-                    if repo_name in pp['repos']
-                )
-                parallel_marker = " [并行]" if is_parallel else ""
-                lines.append(f"- 会话{idx}: {s['start']} ~ {s['end']} ({s['duration_minutes']} 分钟, {len(s['commits'])} 次提交){parallel_marker}")
+                parallel_marker = " [并行]" if is_parallel(s) else ""
+                w(f"- 会话{idx}: {s['start']} ~ {s['end']} ({s['duration_minutes']} 分钟, {len(s['commits'])} 次提交){parallel_marker}\n")
         # Feature windows
-        flat_commits: List[Dict] = []
-        for items in grouped.values():
-            flat_commits.extend(items)
-        fw = compute_feature_windows(flat_commits)
+        # 功能窗口只需遍历一次，直接在各天的列表上迭代，不再拼接扁平列表
+        fw = compute_feature_windows(chain.from_iterable(grouped.values()))
         if fw:
-            lines.append("功能窗口:")
+            w("功能窗口:\n")
             for k, v in fw.items():
                 duration = int((v['end'] - v['start']).total_seconds() // 60)
-                lines.append(f"- {k}: {v['start']} ~ {v['end']} ({duration} 分钟, {v['count']} 次提交)")
-        for day, items in grouped.items():
-            lines.append(f"\n## {day} ({len(items)} commits)")
-            for c in items:
-                sha = c['sha']
-                files, ins, dels, body = repo_to_details[repo_name].get(sha, ([], 0, 0, ""))
-                short_sha = sha[:8]
-                time_part = ' '.join(c['date'].split(' ')[1:3]) if ' ' in c['date'] else c['date']
-                lines.append(f"\n- [{short_sha}] {time_part}")
-                lines.append(f"  提交信息: {c['message']}")
-                lines.append(f"  统计: {ins} 行新增, {dels} 行删除, {len(files)} 个文件")
-                if body and body.strip() != c['message']:
-                    lines.append(f"  详细内容:\n{body}")
-                if files:
-                    lines.append(f"  修改的文件: {', '.join(files[:20])}{' ...' if len(files) > 20 else ''}")
-    return "\n".join(lines)
+                w(f"- {k}: {v['start']} ~ {v['end']} ({duration} 分钟, {v['count']} 次提交)\n")
+        w(_build_single_project_context(grouped, repo_to_details[repo_name], max_commits_per_day, max_body_chars, compact_before))
+        w("\n")
+    # 去掉最后一个换行，与逐行 "\n".join 的结果保持一致
+    return buf.getvalue()[:-1]
+
+# AI 总结缓存目录：相同提示词 + 模型的总结直接复用，避免重复调用 LLM
+SUMMARY_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "git2work", "summaries")
+
+def _summary_cache_key(provider: str, model: str, system_msg: str, user_msg: str, temperature: float) -> str:
+    # 影响生成结果的所有参数都参与哈希，任一变化都会生成新的缓存条目
+    payload = json.dumps([provider, model, system_msg, user_msg, temperature], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def _summary_cache_get(key: str, ttl_days: Optional[float] = None) -> Optional[str]:
+    """
+    读取缓存的总结；设置 ttl_days 时忽略早于该天数写入的条目。
+    """
+    path = os.path.join(SUMMARY_CACHE_DIR, f"{key}.md")
+    try:
+        if ttl_days is not None and time.time() - os.path.getmtime(path) > ttl_days * 86400:
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read()
+    except OSError:
+        return None
+
+def _summary_cache_put(key: str, text: str) -> None:
+    try:
+        os.makedirs(SUMMARY_CACHE_DIR, exist_ok=True)
+        # 先写临时文件再替换，避免并发/中断时留下不完整的缓存
+        path = os.path.join(SUMMARY_CACHE_DIR, f"{key}.md")
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Warning: 写入总结缓存失败: {e}")
+
+# LLM 调用：单次读超时（秒，流式模式下为两个数据块之间的最长等待）与失败重试次数
+LLM_TIMEOUT_SECONDS = 30
+# 生成总结的采样温度（同时参与总结缓存的键）
+LLM_TEMPERATURE = 0.3
+LLM_MAX_RETRIES = 3
+
+def _make_http_session(pool_maxsize: int = 32) -> requests.Session:
+    """
+    创建带连接池（HTTP keep-alive）与自动重试的 requests.Session。
+    重试覆盖连接错误与 429/5xx（指数退避，遵循 Retry-After），POST 也会重试。
+    """
+    session = requests.Session()
+    retry = Retry(
+        total=LLM_MAX_RETRIES,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=None,  # None 表示所有方法（包括 POST）都可重试
+        raise_on_status=False,  # 重试耗尽后返回最后的响应，由 raise_for_status 给出错误详情
+    )
+    adapter = HTTPAdapter(pool_connections=16, pool_maxsize=pool_maxsize, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+# 模块内所有 HTTP 请求（DeepSeek、GitHub GraphQL、Gitee 分页）共用一个 Session：
+# 按主机划分的连接池在多次请求之间保持 keep-alive，第二次起的请求免去 TCP + TLS 握手；
+# 连接池大小不小于 GITEE_PAGE_WORKERS / FETCH_MAX_WORKERS 的并发数
+_HTTP_SESSION = _make_http_session()
+
+def _json_dumps_bytes(obj) -> bytes:
+    """
+    序列化为 UTF-8 JSON 字节；安装 orjson 时使用 orjson（大请求体编码更快）。
+    """
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+def _json_loads(data):
+    """
+    解析 JSON（str 或 bytes）；安装 orjson 时使用 orjson。
+    """
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def _iter_sse_deltas(resp: requests.Response) -> Iterator[str]:
+    """
+    解析 OpenAI 兼容的 SSE 流（data: {...} / data: [DONE]），逐个产出增量文本。
+    """
+    for line in resp.iter_lines():
+        if not line or not line.startswith(b"data:"):
+            continue  # 空行或 ": keep-alive" 注释
+        data = line[5:].strip()
+        if data == b"[DONE]":
+            break
+        chunk = _json_loads(data)
+        choices = chunk.get("choices") or []
+        if choices:
+            delta = (choices[0].get("delta") or {}).get("content")
+            if delta:
+                yield delta
+
+@lru_cache(maxsize=8)
+def _tiktoken_encoding(model: str):
+    import tiktoken
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        # 非 OpenAI 模型（如 DeepSeek）使用通用编码近似
+        return tiktoken.get_encoding("cl100k_base")
+
+def count_tokens(text: str, model: str = "gpt-4o-mini") -> int:
+    """
+    统计文本的 token 数：安装 tiktoken 时精确计算，否则按 UTF-8 字节数 / 3 估算（中文约每字 1 token，偏保守）。
+    """
+    if TIKTOKEN_AVAILABLE:
+        return len(_tiktoken_encoding(model).encode(text, disallowed_special=()))
+    return len(text.encode("utf-8")) // 3
+
+def _build_summary_messages(
+    grouped: Dict[str, List[Dict]],
+    details: Dict[str, Tuple[List[str], int, int, str]],
+    system_prompt: Optional[str] = None,
+    author: Optional[str] = None,
+    gap_minutes: int = 60,
+    repo_to_pull_times: Optional[Dict[str, List[datetime]]] = None,
+    repo_to_sessions: Optional[Dict[str, List[Dict]]] = None,
+    parallel_periods: Optional[List[Dict]] = None,
+    max_commits_per_day: Optional[int] = None,
+    max_body_chars: Optional[int] = None,
+    max_context_tokens: Optional[int] = None,
+    model: str = "gpt-4o-mini"
+) -> Optional[Tuple[str, str]]:
+    """
+    构建发给 LLM 的 (system_msg, user_msg)，各 provider 的同步/异步实现共用。
+    没有可总结的提交时返回 None。
+    设置 max_context_tokens 时，上下文超出预算则从最早的提交开始省略详细内容、截短文件列表，
+    二分查找需要精简的最少提交数，直到不超过预算（全部精简仍超出时保留全部精简后的结果）。
+    """
+    # 兼容单项目或多项目上下文
+    multi = isinstance(grouped, dict) and bool(grouped) and all(isinstance(v, dict) for v in grouped.values())
+
+    def build_context(compact_before: Optional[int] = None) -> str:
+        if multi:
+            # 多项目：grouped: repo -> {day -> commits}；使用传入的 repo_to_pull_times（如果提供）
+            return build_commit_context_by_project(grouped, details, gap_minutes, repo_to_pull_times, repo_to_sessions, parallel_periods, max_commits_per_day, max_body_chars, compact_before)  # type: ignore
+        return _build_single_project_context(grouped, details, max_commits_per_day, max_body_chars, compact_before)
+
+    commit_context = build_context()
+    if max_context_tokens and count_tokens(commit_context, model) > max_context_tokens:
+        days = chain.from_iterable(g.values() for g in grouped.values()) if multi else grouped.values()  # type: ignore
+        epochs = sorted(map(commit_epoch, chain.from_iterable(days)))
+        # 精简前 k 个（最早的）提交：k 越大上下文越短，二分查找满足预算的最小 k
+        lo, hi = 1, len(epochs)
+        fitted = None
+        while lo <= hi:
+            mid = (lo + hi) // 2
+            candidate = build_context(epochs[mid - 1] + 1)
+            if count_tokens(candidate, model) <= max_context_tokens:
+                fitted, hi = candidate, mid - 1
+            else:
+                lo = mid + 1
+        if fitted is None and epochs:
+            commit_context = build_context(epochs[-1] + 1)
+            print(f"Warning: 已精简全部 {len(epochs)} 个提交，上下文仍超出 {max_context_tokens} tokens")
+        elif fitted is not None:
+            commit_context = fitted
+            # 同一秒内的提交会一起精简，按实际阈值统计
+            compacted = bisect.bisect_right(epochs, epochs[lo - 1])
+            print(f"上下文超出 {max_context_tokens} tokens，已精简最早的 {compacted} 个提交（省略详细内容，文件列表截短）")
+    if len(commit_context) <10:
+        return None
+    system_msg = system_prompt or _DEFAULT_SYSTEM_MSG
+    if author:
+        system_msg += f"\n此外，请基于作者姓名或邮箱包含“{author}”的提交进行工作总结，并在摘要开头显式标注：作者：{author}。"
+        user_msg = f"请根据以下 commit 记录生成{author}工作总结：\n\n{commit_context}"
+        user_msg += PEI
+    else:
+        user_msg = f"请根据以下 commit 记录生成工作总结：\n\n{commit_context}"
+    return system_msg, user_msg
+
+@lru_cache(maxsize=8)
+def _get_openai_client(api_key: str) -> "OpenAI":
+    """
+    按 API key 复用 OpenAI 客户端（内部的 httpx 连接池、TLS 上下文只初始化一次）。
+    超时与重试（连接错误、429、5xx，指数退避）交给 SDK 处理。
+    """
+    from openai import OpenAI
+    return OpenAI(api_key=api_key, timeout=LLM_TIMEOUT_SECONDS, max_retries=LLM_MAX_RETRIES)
+
+# AsyncOpenAI 的连接绑定在创建它的事件循环上，因此按事件循环分别缓存，循环结束后随之释放
+_ASYNC_OPENAI_CLIENTS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, Any]]" = weakref.WeakKeyDictionary()
+
+def _get_async_openai_client(api_key: str) -> "AsyncOpenAI":
+    """
+    在当前事件循环内按 API key 复用 AsyncOpenAI 客户端（按项目并发总结时各请求共享一个连接池）。
+    """
+    clients = _ASYNC_OPENAI_CLIENTS.setdefault(asyncio.get_running_loop(), {})
+    client = clients.get(api_key)
+    if client is None:
+        from openai import AsyncOpenAI
+        client = clients[api_key] = AsyncOpenAI(api_key=api_key, timeout=LLM_TIMEOUT_SECONDS, max_retries=LLM_MAX_RETRIES)
+    return client
 
 def generate_summary_with_openai(
     grouped: Dict[str, List[Dict]], 
@@ -812,11 +1409,20 @@ def generate_summary_with_openai(
     model: str = "gpt-4o-mini",
     author: Optional[str] = None,
     gap_minutes: int = 60,
-    repo_to_pull_times: Optional[Dict[str, List[datetime]]] = None
+    repo_to_pull_times: Optional[Dict[str, List[datetime]]] = None,
+    repo_to_sessions: Optional[Dict[str, List[Dict]]] = None,
+    parallel_periods: Optional[List[Dict]] = None,
+    use_cache: bool = True,
+    cache_ttl_days: Optional[float] = None,
+    max_commits_per_day: Optional[int] = None,
+    max_body_chars: Optional[int] = None,
+    max_context_tokens: Optional[int] = None,
+    on_delta: Optional[Callable[[str], None]] = None
 ) -> str:
     """
     使用 OpenAI API 生成工作总结。
     如果没有提供 API key，会尝试从环境变量 OPENAI_API_KEY 获取。
+    以流式方式接收结果，每收到一段文本即调用 on_delta（如提供）。
     """
     if not OPENAI_AVAILABLE:
         return "错误：未安装 openai 包。请运行: pip install openai"
@@ -825,52 +1431,110 @@ def generate_summary_with_openai(
     if not api_key:
         return "错误：未提供 OpenAI API key。请设置环境变量 OPENAI_API_KEY 或使用 --openai-key 参数"
     
-    client = OpenAI(api_key=api_key)
+    client = _get_openai_client(api_key)
     
-    # 兼容单项目或多项目上下文
-    if isinstance(grouped, dict) and grouped and all(isinstance(v, dict) for v in grouped.values()):
-        # 多项目：grouped: repo -> {day -> commits}
-        repo_to_grouped = grouped  # type: ignore
-        repo_to_details = details  # type: ignore
-        # 使用传入的 repo_to_pull_times（如果提供）
-        commit_context = build_commit_context_by_project(repo_to_grouped, repo_to_details, gap_minutes, repo_to_pull_times)  # type: ignore
-    else:
-        context_lines = []
-        for day, items in grouped.items():
-            context_lines.append(f"\n## {day} ({len(items)} commits)")
-            for c in items:
-                sha = c['sha']
-                files, ins, dels, body = details.get(sha, ([], 0, 0, ""))
-                short_sha = sha[:8]
-                time_part = ' '.join(c['date'].split(' ')[1:3]) if ' ' in c['date'] else c['date']
-                context_lines.append(f"\n- [{short_sha}] {time_part}")
-                context_lines.append(f"  提交信息: {c['message']}")
-                context_lines.append(f"  统计: {ins} 行新增, {dels} 行删除, {len(files)} 个文件")
-                if body and body.strip() != c['message']:
-                    context_lines.append(f"  详细内容:\n{body}")
-                if files:
-                    context_lines.append(f"  修改的文件: {', '.join(files[:20])}{' ...' if len(files) > 20 else ''}")
-        commit_context = "\n".join(context_lines)
-    if len(commit_context) <10:
+    messages = _build_summary_messages(grouped, details, system_prompt, author, gap_minutes, repo_to_pull_times, repo_to_sessions, parallel_periods, max_commits_per_day, max_body_chars, max_context_tokens, model)
+    if messages is None:
         return "今天无工作，无法生成工作总结。"
-    system_msg = system_prompt or default_system_prompt + "\n此外，请按项目分别估算投入时间（根据提交时间密度与连续性），并给出每个项目的主要产出。"
-    if author:
-        system_msg += f"\n此外，请基于作者姓名或邮箱包含“{author}”的提交进行工作总结，并在摘要开头显式标注：作者：{author}。"
-        user_msg = f"请根据以下 commit 记录生成{author}工作总结：\n\n{commit_context}"
-        user_msg += PEI
-    else:
-        user_msg = f"请根据以下 commit 记录生成工作总结：\n\n{commit_context}"
+    system_msg, user_msg = messages
+    
+    cache_key = _summary_cache_key("openai", model, system_msg, user_msg, LLM_TEMPERATURE)
+    if use_cache:
+        cached = _summary_cache_get(cache_key, cache_ttl_days)
+        if cached is not None:
+            print("命中 AI 总结缓存，跳过 API 调用")
+            return cached
     
     try:
-        response = client.chat.completions.create(
+        stream = client.chat.completions.create(
             model=model,
             messages=[
                 {"role": "system", "content": system_msg},
                 {"role": "user", "content": user_msg}
             ],
-            temperature=0.3
+            temperature=LLM_TEMPERATURE,
+            stream=True
         )
-        return response.choices[0].message.content.strip()
+        parts: List[str] = []
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                if on_delta:
+                    on_delta(delta)
+        summary = "".join(parts).strip()
+        if summary:
+            _summary_cache_put(cache_key, summary)
+        return summary
+    except Exception as e:
+        return f"错误：调用 OpenAI API 失败: {str(e)}"
+
+async def agenerate_summary_with_openai(
+    grouped: Dict[str, List[Dict]], 
+    details: Dict[str, Tuple[List[str], int, int, str]],
+    system_prompt: Optional[str] = None,
+    openai_api_key: Optional[str] = None,
+    model: str = "gpt-4o-mini",
+    author: Optional[str] = None,
+    gap_minutes: int = 60,
+    repo_to_pull_times: Optional[Dict[str, List[datetime]]] = None,
+    repo_to_sessions: Optional[Dict[str, List[Dict]]] = None,
+    parallel_periods: Optional[List[Dict]] = None,
+    use_cache: bool = True,
+    cache_ttl_days: Optional[float] = None,
+    max_commits_per_day: Optional[int] = None,
+    max_body_chars: Optional[int] = None,
+    max_context_tokens: Optional[int] = None,
+    on_delta: Optional[Callable[[str], None]] = None
+) -> str:
+    """
+    generate_summary_with_openai 的异步版本（AsyncOpenAI），供按项目并发总结时在同一事件循环中 gather。
+    """
+    if not OPENAI_AVAILABLE:
+        return "错误：未安装 openai 包。请运行: pip install openai"
+    
+    api_key = openai_api_key or os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        return "错误：未提供 OpenAI API key。请设置环境变量 OPENAI_API_KEY 或使用 --openai-key 参数"
+    
+    messages = _build_summary_messages(grouped, details, system_prompt, author, gap_minutes, repo_to_pull_times, repo_to_sessions, parallel_periods, max_commits_per_day, max_body_chars, max_context_tokens, model)
+    if messages is None:
+        return "今天无工作，无法生成工作总结。"
+    system_msg, user_msg = messages
+    
+    cache_key = _summary_cache_key("openai", model, system_msg, user_msg, LLM_TEMPERATURE)
+    if use_cache:
+        cached = _summary_cache_get(cache_key, cache_ttl_days)
+        if cached is not None:
+            print("命中 AI 总结缓存，跳过 API 调用")
+            return cached
+    
+    client = _get_async_openai_client(api_key)
+    try:
+        stream = await client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": system_msg},
+                {"role": "user", "content": user_msg}
+            ],
+            temperature=LLM_TEMPERATURE,
+            stream=True
+        )
+        parts: List[str] = []
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                if on_delta:
+                    on_delta(delta)
+        summary = "".join(parts).strip()
+        if summary:
+            _summary_cache_put(cache_key, summary)
+        return summary
     except Exception as e:
         return f"错误：调用 OpenAI API 失败: {str(e)}"
 
@@ -882,45 +1546,28 @@ def generate_summary_with_deepseek(
     model: str = "deepseek-chat",
     author: Optional[str] = None,
     gap_minutes: int = 60,
-    repo_to_pull_times: Optional[Dict[str, List[datetime]]] = None
+    repo_to_pull_times: Optional[Dict[str, List[datetime]]] = None,
+    repo_to_sessions: Optional[Dict[str, List[Dict]]] = None,
+    parallel_periods: Optional[List[Dict]] = None,
+    use_cache: bool = True,
+    cache_ttl_days: Optional[float] = None,
+    max_commits_per_day: Optional[int] = None,
+    max_body_chars: Optional[int] = None,
+    max_context_tokens: Optional[int] = None,
+    on_delta: Optional[Callable[[str], None]] = None
 ) -> str:
     """
     使用 DeepSeek API 生成工作总结（OpenAI 兼容的 Chat Completions 格式）。
+    以 SSE 流式方式接收结果，每收到一段文本即调用 on_delta（如提供）。
     """
     final_key = deepseek_api_key or os.getenv("DEEPSEEK_API_KEY")
     if not final_key:
         return "错误：未提供 DeepSeek API key。请设置环境变量 DEEPSEEK_API_KEY 或使用 --deepseek-key 参数"
 
-    # 构建上下文（支持多项目）
-    if isinstance(grouped, dict) and grouped and all(isinstance(v, dict) for v in grouped.values()):
-        # 使用传入的 repo_to_pull_times（如果提供）
-        commit_context = build_commit_context_by_project(grouped, details, gap_minutes, repo_to_pull_times)  # type: ignore
-    else:
-        context_lines = []
-        for day, items in grouped.items():
-            context_lines.append(f"\n## {day} ({len(items)} commits)")
-            for c in items:
-                sha = c['sha']
-                files, ins, dels, body = details.get(sha, ([], 0, 0, ""))
-                short_sha = sha[:8]
-                time_part = ' '.join(c['date'].split(' ')[1:3]) if ' ' in c['date'] else c['date']
-                context_lines.append(f"\n- [{short_sha}] {time_part}")
-                context_lines.append(f"  提交信息: {c['message']}")
-                context_lines.append(f"  统计: {ins} 行新增, {dels} 行删除, {len(files)} 个文件")
-                if body and body.strip() != c['message']:
-                    context_lines.append(f"  详细内容:\n{body}")
-                if files:
-                    context_lines.append(f"  修改的文件: {', '.join(files[:20])}{' ...' if len(files) > 20 else ''}")
-        commit_context = "\n".join(context_lines)
-    if len(commit_context) <10:
+    messages = _build_summary_messages(grouped, details, system_prompt, author, gap_minutes, repo_to_pull_times, repo_to_sessions, parallel_periods, max_commits_per_day, max_body_chars, max_context_tokens, model)
+    if messages is None:
         return "今天无工作，无法生成工作总结。"
-    system_msg = system_prompt or default_system_prompt + "\n此外，请按项目分别估算投入时间（根据提交时间密度与连续性），并给出每个项目的主要产出。"
-    if author:
-        system_msg += f"\n此外，请基于作者姓名或邮箱包含“{author}”的提交进行工作总结，并在摘要开头显式标注：作者：{author}。"
-        user_msg = f"请根据以下 commit 记录生成{author}工作总结：\n\n{commit_context}"
-        user_msg += PEI
-    else:
-        user_msg = f"请根据以下 commit 记录生成工作总结：\n\n{commit_context}"
+    system_msg, user_msg = messages
     
 
     # 映射模型名称（DeepSeek 的正确模型名称）
@@ -931,24 +1578,42 @@ def generate_summary_with_deepseek(
     }
     actual_model = model_map.get(model.lower(), "deepseek-chat")
 
+    cache_key = _summary_cache_key("deepseek", actual_model, system_msg, user_msg, LLM_TEMPERATURE)
+    if use_cache:
+        cached = _summary_cache_get(cache_key, cache_ttl_days)
+        if cached is not None:
+            print("命中 AI 总结缓存，跳过 API 调用")
+            return cached
+
+    url = "https://api.deepseek.com/v1/chat/completions"
+    headers = {
+        "Authorization": f"Bearer {final_key}",
+        "Content-Type": "application/json"
+    }
+    payload = {
+        "model": actual_model,
+        "messages": [
+            {"role": "system", "content": system_msg},
+            {"role": "user", "content": user_msg}
+        ],
+        "temperature": LLM_TEMPERATURE,
+        "stream": True
+    }
+    # 连接错误与 429/5xx 的重试由 _HTTP_SESSION 的连接池适配器处理
+    resp = None
     try:
-        url = "https://api.deepseek.com/v1/chat/completions"
-        headers = {
-            "Authorization": f"Bearer {final_key}",
-            "Content-Type": "application/json"
-        }
-        payload = {
-            "model": actual_model,
-            "messages": [
-                {"role": "system", "content": system_msg},
-                {"role": "user", "content": user_msg}
-            ],
-            "temperature": 0.3
-        }
-        resp = requests.post(url, headers=headers, json=payload, timeout=60)
+        # 请求体只序列化一次（orjson 可用时更快），以 data= 发送，Content-Type 已在 headers 中设置
+        resp = _HTTP_SESSION.post(url, headers=headers, data=_json_dumps_bytes(payload), timeout=(10, LLM_TIMEOUT_SECONDS), stream=True)
         resp.raise_for_status()
-        data = resp.json()
-        return data["choices"][0]["message"]["content"].strip()
+        parts: List[str] = []
+        for delta in _iter_sse_deltas(resp):
+            parts.append(delta)
+            if on_delta:
+                on_delta(delta)
+        summary = "".join(parts).strip()
+        if summary:
+            _summary_cache_put(cache_key, summary)
+        return summary
     except requests.exceptions.HTTPError as e:
         error_detail = ""
         try:
@@ -959,6 +1624,84 @@ def generate_summary_with_deepseek(
     except Exception as e:
         return f"错误：调用 DeepSeek API 失败: {str(e)}"
 
+# 按项目并发生成总结时的最大并发请求数
+SUMMARY_MAX_WORKERS = 8
+# 同步 summary_fn -> 对应的异步实现；DeepSeek 走 requests 连接池，没有异步版本，按项目并发时放到线程中执行
+_ASYNC_SUMMARY_FNS: Dict[Callable[..., str], Callable[..., Awaitable[str]]] = {
+    generate_summary_with_openai: agenerate_summary_with_openai,
+}
+
+def generate_summaries_per_project(
+    summary_fn: Callable[..., str],
+    repo_to_grouped: Dict[str, Dict[str, List[Dict]]],
+    repo_to_details: Dict[str, Dict[str, Tuple[List[str], int, int, str]]],
+    repo_to_pull_times: Optional[Dict[str, List[datetime]]] = None,
+    repo_to_sessions: Optional[Dict[str, List[Dict]]] = None,
+    parallel_periods: Optional[List[Dict]] = None,
+    requests_per_minute: Optional[float] = None,
+    **summary_kwargs
+) -> str:
+    """
+    多项目模式下为每个项目单独生成总结（asyncio.gather 并发，最多 SUMMARY_MAX_WORKERS 个请求同时进行），按项目顺序拼接。
+    总耗时约为最慢的单个项目，而不是一次超长提示词的耗时。
+    summary_fn 有异步版本（见 _ASYNC_SUMMARY_FNS）时直接在事件循环中 await，否则放到线程中执行。
+    设置 requests_per_minute 时按固定间隔错开各请求的发起时间，主动避开提供方的 RPM 限制（429 及退避重试由 SDK / 连接池处理）。
+    每个项目的上下文只包含该项目的会话，以及它参与的跨项目并行时段。
+    """
+    repos = [r for r, g in repo_to_grouped.items() if g]
+    if not repos:
+        return ""
+    async_fn = _ASYNC_SUMMARY_FNS.get(summary_fn)
+
+    async def summarize(repo: str, limit: asyncio.Semaphore) -> str:
+        args = ({repo: repo_to_grouped[repo]}, {repo: repo_to_details.get(repo, {})})
+        kwargs = dict(
+            repo_to_pull_times={repo: repo_to_pull_times.get(repo, [])} if repo_to_pull_times else None,
+            repo_to_sessions={repo: repo_to_sessions[repo]} if repo_to_sessions and repo in repo_to_sessions else None,
+            parallel_periods=[p for p in parallel_periods if repo in p['repos']] if parallel_periods is not None else None,
+            **summary_kwargs
+        )
+        async with limit:
+            await throttle()
+            if async_fn is not None:
+                return await async_fn(*args, **kwargs)
+            return await asyncio.to_thread(summary_fn, *args, **kwargs)
+
+    interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+    next_start: Optional[float] = None
+
+    async def throttle() -> None:
+        # 事件循环单线程执行，读写 next_start 无需加锁
+        nonlocal next_start
+        if not interval:
+            return
+        now = asyncio.get_running_loop().time()
+        wait = (next_start - now) if next_start is not None else 0.0
+        next_start = max(now, next_start or now) + interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    async def summarize_all() -> List[str]:
+        limit = asyncio.Semaphore(SUMMARY_MAX_WORKERS)
+        return await asyncio.gather(*(summarize(repo, limit) for repo in repos))
+
+    summaries = asyncio.run(summarize_all())
+    return "\n\n".join(f"## 项目总结：{repo}\n\n{text}" for repo, text in zip(repos, summaries) if text)
+
+def _format_commit_markdown(c: Dict, details: Dict[str, Tuple[List[str], int, int, str]]) -> str:
+    """
+    单个 commit 在工作日志正文中的 Markdown 片段（单项目与多项目渲染共用），以换行结尾。
+    """
+    sha = c['sha']
+    files, ins, dels, body = details.get(sha, ([], 0, 0, ""))
+    block = f"- [{sha[:8]}] {_commit_time_part(c['date'])} | {c['message']} ({ins}+/{dels}-; {len(files)} files)\n"
+    if files:
+        block += f"  - files: {', '.join(files[:10])}{' ...' if len(files) > 10 else ''}\n"
+    if body:
+        body_lines = "\n".join(body.splitlines())
+        block += f"  - message:\n```\n{body_lines}\n```\n"
+    return block
+
 def render_markdown_worklog(
     title: str, 
     grouped: Dict[str, List[Dict]], 
@@ -966,110 +1709,68 @@ def render_markdown_worklog(
     add_summary: bool = False,
     summary_text: Optional[str] = None
 ) -> str:
-    lines: List[str] = []
-    lines.append(f"# {title}")
-    lines.append("")
+    buf = io.StringIO()
+    w = buf.write
+    w(f"# {title}\n\n")
     total_commits = sum(len(v) for v in grouped.values())
-    lines.append(f"总计 {total_commits} 个提交")
-    lines.append("")
+    w(f"总计 {total_commits} 个提交\n\n")
     for day, items in grouped.items():
-        lines.append(f"## {day} ({len(items)} commits)")
-        lines.append("")
-        for c in items:
-            sha = c['sha']
-            short_sha = sha[:8]
-            files, ins, dels, body = details.get(sha, ([], 0, 0, ""))
-            time_part = ' '.join(c['date'].split(' ')[1:3]) if ' ' in c['date'] else c['date']
-            lines.append(f"- [{short_sha}] {time_part} | {c['message']} ({ins}+/{dels}-; {len(files)} files)")
-            if files:
-                lines.append(f"  - files: {', '.join(files[:10])}{' ...' if len(files) > 10 else ''}")
-            if body:
-                lines.append("  - message:")
-                lines.append("```")
-                lines.extend(body.splitlines())
-                lines.append("```")
-        lines.append("")
+        w(f"## {day} ({len(items)} commits)\n\n")
+        buf.writelines(_format_commit_markdown(c, details) for c in items)
+        w("\n")
     
     # 添加总结
     if add_summary and summary_text:
-        lines.append(summary_text)
+        w(f"{summary_text}\n")
     
-    return "\n".join(lines)
-
-def render_multi_project_worklog(title: str, repo_to_grouped: Dict[str, Dict[str, List[Dict]]], repo_to_details: Dict[str, Dict[str, Tuple[List[str], int, int, str]]], add_summary: bool = False, summary_text: Optional[str] = None, gap_minutes: int = 60, repo_to_pull_times: Optional[Dict[str, List[datetime]]] = None) -> str:
-    lines: List[str] = []
-    lines.append(f"# {title}")
-    lines.append("")
-    total_commits = sum(sum(len(v) for v in grouped.values()) for grouped in repo_to_grouped.values())
-    lines.append(f"总计 {total_commits} 个提交，项目数 {len(repo_to_grouped)}")
-    lines.append("")
-    
-    # 计算并行工作时间
-    repo_to_sessions: Dict[str, List[Dict]] = {}
-    for repo_name, grouped in repo_to_grouped.items():
-        flat_commits: List[Dict] = []
-        for items in grouped.values():
-            flat_commits.extend(items)
-        # 获取该仓库的 pull 时间（如果是本地仓库）
-        pull_times = repo_to_pull_times.get(repo_name, []) if repo_to_pull_times else []
-        sessions = compute_work_sessions(flat_commits, gap_minutes, pull_times)
-        repo_to_sessions[repo_name] = sessions
+    # 去掉最后一个换行，与逐行 "\n".join 的结果保持一致
+    return buf.getvalue()[:-1]
+
+def render_multi_project_worklog(title: str, repo_to_grouped: Dict[str, Dict[str, List[Dict]]], repo_to_details: Dict[str, Dict[str, Tuple[List[str], int, int, str]]], add_summary: bool = False, summary_text: Optional[str] = None, gap_minutes: int = 60, repo_to_pull_times: Optional[Dict[str, List[datetime]]] = None, repo_to_sessions: Optional[Dict[str, List[Dict]]] = None, parallel_periods: Optional[List[Dict]] = None) -> str:
+    buf = io.StringIO()
+    w = buf.write
+    w(f"# {title}\n\n")
+    total_commits = sum(len(items) for grouped in repo_to_grouped.values() for items in grouped.values())
+    w(f"总计 {total_commits} 个提交，项目数 {len(repo_to_grouped)}\n\n")
     
-    parallel_periods = detect_parallel_sessions(repo_to_sessions)
+    # 计算并行工作时间（调用方已算好时直接复用）
+    if repo_to_sessions is None:
+        repo_to_sessions = compute_repo_sessions(repo_to_grouped, gap_minutes, repo_to_pull_times)
+    if parallel_periods is None:
+        parallel_periods = detect_parallel_sessions(repo_to_sessions)
     if parallel_periods:
-        lines.append("## 跨项目并行工作时间统计")
+        w("## 跨项目并行工作时间统计\n")
         total_parallel_minutes = sum(p['duration_minutes'] for p in parallel_periods)
-        lines.append(f"检测到 **{len(parallel_periods)} 个并行工作时段**，总重叠时长约 **{total_parallel_minutes} 分钟**")
-        lines.append("")
+        w(f"检测到 **{len(parallel_periods)} 个并行工作时段**，总重叠时长约 **{total_parallel_minutes} 分钟**\n\n")
         for idx, p in enumerate(parallel_periods, 1):
             repos_str = ', '.join(p['repos'])
-            lines.append(f"- **并行时段 {idx}**：{p['start'].strftime('%Y-%m-%d %H:%M')} ~ {p['end'].strftime('%Y-%m-%d %H:%M')} ({p['duration_minutes']} 分钟)")
-            lines.append(f"  - 涉及项目：{repos_str}")
-        lines.append("")
-        lines.append("> 注意：并行工作时间不应简单累加，实际投入时间以重叠时段的最大值为准。")
-        lines.append("")
+            w(f"- **并行时段 {idx}**：{p['start'].strftime('%Y-%m-%d %H:%M')} ~ {p['end'].strftime('%Y-%m-%d %H:%M')} ({p['duration_minutes']} 分钟)\n"
+              f"  - 涉及项目：{repos_str}\n")
+        w("\n> 注意：并行工作时间不应简单累加，实际投入时间以重叠时段的最大值为准。\n\n")
     
     # 各项目时间统计
-    lines.append("## 各项目时间统计")
+    w("## 各项目时间统计\n")
     for repo_name, grouped in repo_to_grouped.items():
         sessions = repo_to_sessions[repo_name]
         if sessions:
             total_minutes = sum(s['duration_minutes'] for s in sessions)
-            lines.append(f"### {repo_name}")
-            lines.append(f"- 工作会话：{len(sessions)} 个，总时长约 {total_minutes} 分钟")
+            w(f"### {repo_name}\n- 工作会话：{len(sessions)} 个，总时长约 {total_minutes} 分钟\n")
+            is_parallel = _parallel_overlap_checker(parallel_periods, repo_name)
             for idx, s in enumerate(sessions, 1):
-                is_parallel = any(
-                    not (s['end'] < pp['start'] or s['start'] > pp['end'])
-                    for pp in parallel_periods
-                    if repo_name in pp['repos']
-                )
-                parallel_marker = " **[并行]**" if is_parallel else ""
-                lines.append(f"  - 会话{idx}：{s['start'].strftime('%H:%M')} ~ {s['end'].strftime('%H:%M')} ({s['duration_minutes']} 分钟, {len(s['commits'])} 次提交){parallel_marker}")
-    lines.append("")
+                parallel_marker = " **[并行]**" if is_parallel(s) else ""
+                w(f"  - 会话{idx}：{s['start'].strftime('%H:%M')} ~ {s['end'].strftime('%H:%M')} ({s['duration_minutes']} 分钟, {len(s['commits'])} 次提交){parallel_marker}\n")
+    w("\n")
     for repo_name, grouped in repo_to_grouped.items():
-        lines.append(f"# 项目：{repo_name}")
-        lines.append("")
+        w(f"# 项目：{repo_name}\n\n")
         for day, items in grouped.items():
-            lines.append(f"## {day} ({len(items)} commits)")
-            lines.append("")
-            for c in items:
-                sha = c['sha']
-                short_sha = sha[:8]
-                files, ins, dels, body = repo_to_details[repo_name].get(sha, ([], 0, 0, ""))
-                time_part = ' '.join(c['date'].split(' ')[1:3]) if ' ' in c['date'] else c['date']
-                lines.append(f"- [{short_sha}] {time_part} | {c['message']} ({ins}+/{dels}-; {len(files)} files)")
-                if files:
-                    lines.append(f"  - files: {', '.join(files[:10])}{' ...' if len(files) > 10 else ''}")
-                if body:
-                    lines.append("  - message:")
-                    lines.append("```")
-                    lines.extend(body.splitlines())
-                    lines.append("```")
-            lines.append("")
-        lines.append("")
+            w(f"## {day} ({len(items)} commits)\n\n")
+            buf.writelines(_format_commit_markdown(c, repo_to_details[repo_name]) for c in items)
+            w("\n")
+        w("\n")
     if add_summary and summary_text:
-        lines.append(summary_text)
-    return "\n".join(lines)
+        w(f"{summary_text}\n")
+    # 去掉最后一个换行，与逐行 "\n".join 的结果保持一致
+    return buf.getvalue()[:-1]
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Generate work log from git commits")
@@ -1089,7 +1790,15 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument('--add-summary', action='store_true', help='Add AI-generated Chinese summary at the end')
     parser.add_argument('--openai-key', type=str, default=None, help='OpenAI API key (or set OPENAI_API_KEY env var)')
     parser.add_argument('--openai-model', type=str, default='gpt-4o-mini', help='OpenAI model to use (default: gpt-4o-mini)')
+    parser.add_argument('--max-commits-per-day', type=int, default=30, help='Max commits per day sent to the LLM, keeping the largest by changed lines (0 = no limit, default: 30)')
+    parser.add_argument('--max-body-chars', type=int, default=500, help='Truncate commit bodies sent to the LLM to N characters (0 = no limit, default: 500)')
+    parser.add_argument('--max-context-tokens', type=int, default=None, help='Token budget for the commit context sent to the LLM; when exceeded, the oldest commits lose their bodies and keep only 3 files (uses tiktoken if installed, otherwise an estimate)')
+    parser.add_argument('--summary-per-project', action='store_true', help='In multi-project mode, summarize each project with its own concurrent LLM call')
+    parser.add_argument('--summary-rpm', type=float, default=None, help='With --summary-per-project, start at most N LLM requests per minute (default: no limit)')
     parser.add_argument('--system-prompt-file', type=str, default=None, help='Path to custom system prompt file')
+    parser.add_argument('--no-cache-summary', action='store_true', help='Bypass the on-disk AI summary cache (~/.cache/git2work/summaries)')
+    parser.add_argument('--summary-cache-ttl-days', type=float, default=None, help='Ignore cached AI summaries older than N days (default: never expire)')
+    parser.add_argument('--no-cache-commits', action='store_true', help='Bypass the on-disk per-commit numstat/body cache (~/.cache/git2work/commits.sqlite)')
     # DeepSeek 支持
     parser.add_argument('--provider', type=str, default='openai', choices=['openai', 'deepseek'], help='LLM provider')
     parser.add_argument('--deepseek-key', type=str, default=None, help='DeepSeek API key (or set DEEPSEEK_API_KEY env var)')
@@ -1108,6 +1817,94 @@ def parse_date_input(value: Optional[str], default_dt: Optional[datetime]) -> Op
         except Exception:
             raise ValueError(f"无法解析日期: {value}")
 
+# 本地扫描与远程 API 请求共用的最大并发数（同时照顾 API 速率限制）
+FETCH_MAX_WORKERS = 8
+
+def filter_by_author(commits: Iterable[Dict], author: Optional[str], match_email: bool = True) -> List[Dict]:
+    """
+    按作者过滤提交：author 作为不区分大小写的子串匹配姓名（match_email 为 True 时也匹配邮箱）。
+    author 为空时原样返回。
+    """
+    if not author:
+        return list(commits)
+    author_lower = author.lower()
+    if match_email:
+        return [c for c in commits if author_lower in c['author_name'].lower() or author_lower in c['author_email'].lower()]
+    return [c for c in commits if author_lower in c['author_name'].lower()]
+
+def scan_local_repo(repo_path: str, since_dt: datetime, until_dt: datetime, author: Optional[str] = None, use_cache: bool = True) -> Tuple[List[Dict], Dict[str, Tuple[List[str], int, int, str]], List[datetime]]:
+    """
+    扫描单个本地仓库：commits（按作者过滤）、details 与 pull 操作时间。
+    各仓库之间互不依赖，可在线程池中并发执行（耗时主要在 git 子进程等待，不受 GIL 限制）。
+
+    Returns:
+        (commits, details, pull_times)
+    """
+    commits, details = get_commits_with_details(repo_path, since_dt, until_dt, use_cache, author)
+    # git 已按 "Name <email>" 预过滤；这里在更小的结果集上保持原有的"姓名或邮箱包含"语义
+    commits = filter_by_author(commits, author)
+    pull_times = get_pull_operations(repo_path, since_dt, until_dt)
+    return commits, details, pull_times
+
+def fetch_remote_repo(platform: str, repo_full_name: str, token: str, since_dt: datetime, until_dt: datetime, author: Optional[str] = None) -> Optional[Tuple[List[Dict], Dict[str, Tuple[List[str], int, int, str]]]]:
+    """
+    获取单个远程仓库（platform 为 "github" 或 "gitee"）的事件并按作者过滤。
+    失败时打印错误并返回 None，不影响其他仓库；可与本地扫描一起在线程池中并发执行。
+
+    Returns:
+        (commits, details)；远程仓库无法获取 numstat，details 使用占位值
+    """
+    label, fetch = ("GitHub", get_github_events) if platform == "github" else ("Gitee", get_gitee_events)
+    try:
+        commits = fetch(repo_full_name, token, since_dt, until_dt)
+    except Exception as e:
+        print(f"Error: 获取 {label} 仓库 {repo_full_name} 失败: {e}")
+        return None
+    # 远程提交的邮箱通常为空或不可靠，只按姓名匹配
+    commits = filter_by_author(commits, author, match_email=False)
+    details = {c['sha']: ([], 0, 0, c['message']) for c in commits}
+    return commits, details
+
+def _write_all(fd: int, data: bytes) -> int:
+    """
+    把 data 完整写入文件描述符（os.write 可能只写入一部分），返回写入的字节数。
+    """
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+    return len(data)
+
+def _drain_summary_deltas(deltas: "queue.Queue[str]", future) -> Iterator[str]:
+    """
+    依次产出后台总结线程放入队列的流式增量，直到任务结束且队列取空。
+    """
+    while True:
+        try:
+            yield deltas.get(timeout=0.1)
+        except queue.Empty:
+            if future.done() and deltas.empty():
+                return
+
+def _stripped_deltas(deltas: Iterable[str]) -> Iterator[str]:
+    """
+    逐段产出流式增量，拼接结果与 "".join(deltas).strip() 一致：
+    丢弃开头的空白，结尾的空白暂存，直到后面再出现非空白文本时才一并产出。
+    """
+    started = False
+    pending = ""
+    for delta in deltas:
+        if not started:
+            delta = delta.lstrip()
+            if not delta:
+                continue
+            started = True
+        text = delta.rstrip()
+        if text:
+            yield pending + text
+            pending = delta[len(text):]
+        else:
+            pending += delta
+
 def git2work():
     args = parse_args()
     repo_paths: List[str] = []
@@ -1161,63 +1958,47 @@ def git2work():
     # 如果任何一个类型有多个仓库，或者总仓库数大于1，都进入多项目模式
     multi_project = (len(repo_paths) > 1 or len(github_repos) > 1 or len(gitee_repos) > 1 or total_repos > 1)
 
+    # 本地扫描与远程 API 请求相互独立：统一提交到一个线程池并发执行，总耗时约为最慢的单个仓库；
+    # 结果按 本地 -> GitHub -> Gitee 的原有顺序读取
+    with ThreadPoolExecutor(max_workers=max(1, min(FETCH_MAX_WORKERS, total_repos))) as fetch_ex:
+        local_futures = [
+            fetch_ex.submit(scan_local_repo, repo, start, end, args.author, not args.no_cache_commits)
+            for repo in repo_paths
+        ]
+        remote_futures = [
+            (repo_name, fetch_ex.submit(fetch_remote_repo, "github", repo_name, github_token, start, end, args.author))
+            for repo_name in github_repos
+        ] + [
+            (repo_name, fetch_ex.submit(fetch_remote_repo, "gitee", repo_name, gitee_token, start, end, args.author))
+            for repo_name in gitee_repos
+        ]
+
     if not multi_project:
         # 单项目模式（只有单个仓库或单个来自不同位置的仓库）
         commits: List[Dict] = []
         details: Dict[str, Tuple[List[str], int, int, str]] = {}
         pull_times: List[datetime] = []  # 用于单项目模式的 pull 时间
         
-        # 处理本地仓库（最多一个）
-        if repo_paths:
-            repo = repo_paths[0]
-            commits = get_commits_between(repo, start, end)
-            if args.author:
-                author_lower = args.author.lower()
-                commits = [c for c in commits if author_lower in c['author_name'].lower() or author_lower in c['author_email'].lower()]
-            # 获取 pull 操作时间
-            pull_times = get_pull_operations(repo, start, end)
-            for c in commits:
-                files, ins, dels = get_commit_numstat(repo, c['sha'])
-                body = get_commit_body(repo, c['sha'])
-                details[c['sha']] = (files, ins, dels, body)
-        
-        # 处理 GitHub 仓库（最多一个）
-        if github_repos and github_token:
-            repo_name = github_repos[0]
-            try:
-                remote_commits = get_github_events(repo_name, github_token, start, end)
-                if args.author:
-                    author_lower = args.author.lower()
-                    remote_commits = [c for c in remote_commits if author_lower in c['author_name'].lower()]
-                commits.extend(remote_commits)
-                # 远程仓库无法获取 numstat，使用占位值
-                for c in remote_commits:
-                    details[c['sha']] = ([], 0, 0, c['message'])
-            except Exception as e:
-                print(f"Error: 获取 GitHub 仓库 {repo_name} 失败: {e}")
+        # 处理本地仓库（最多一个），同时获取 pull 操作时间
+        if local_futures:
+            commits, details, pull_times = local_futures[0].result()
         
-        # 处理 Gitee 仓库（最多一个）
-        if gitee_repos and gitee_token:
-            repo_name = gitee_repos[0]
-            try:
-                remote_commits = get_gitee_events(repo_name, gitee_token, start, end)
-                if args.author:
-                    author_lower = args.author.lower()
-                    remote_commits = [c for c in remote_commits if author_lower in c['author_name'].lower()]
-                commits.extend(remote_commits)
-                # 远程仓库无法获取 numstat，使用占位值
-                for c in remote_commits:
-                    details[c['sha']] = ([], 0, 0, c['message'])
-            except Exception as e:
-                print(f"Error: 获取 Gitee 仓库 {repo_name} 失败: {e}")
+        # 处理 GitHub / Gitee 仓库（最多一个）
+        for repo_name, future in remote_futures:
+            remote = future.result()
+            if remote is not None:
+                commits.extend(remote[0])
+                details.update(remote[1])
         
         # 按时间排序所有 commits
-        commits.sort(key=lambda c: commit_time_dt(c))
+        commits.sort(key=commit_epoch)
         grouped = group_commits_by_date(commits)
         
         # 为单项目模式初始化 repo_to_pull_times_multi
         # 注意：单项目模式不显示会话统计，但保留变量以便一致性
         repo_to_pull_times_multi = None  # type: ignore
+        repo_to_sessions_multi = None  # type: ignore
+        parallel_periods_multi = None  # type: ignore
     else:
         # 多项目模式
         repo_to_commits: Dict[str, List[Dict]] = {}
@@ -1226,115 +2007,143 @@ def git2work():
         repo_to_pull_times: Dict[str, List[datetime]] = {}  # 存储每个本地仓库的 pull 时间
         
         # 处理本地仓库
-        for repo in repo_paths:
-            commits = get_commits_between(repo, start, end)
-            if args.author:
-                author_lower = args.author.lower()
-                commits = [c for c in commits if author_lower in c['author_name'].lower() or author_lower in c['author_email'].lower()]
-            # 获取 pull 操作时间（仅本地仓库）
-            pull_times = get_pull_operations(repo, start, end)
+        for repo, future in zip(repo_paths, local_futures):
+            commits, details_map, pull_times = future.result()
+            # pull 操作时间仅本地仓库可用
             repo_to_pull_times[repo] = pull_times
             repo_to_commits[repo] = commits
-            details_map: Dict[str, Tuple[List[str], int, int, str]] = {}
-            for c in commits:
-                files, ins, dels = get_commit_numstat(repo, c['sha'])
-                body = get_commit_body(repo, c['sha'])
-                details_map[c['sha']] = (files, ins, dels, body)
             repo_to_details[repo] = details_map
             repo_to_grouped[repo] = group_commits_by_date(commits)
         
-        # 处理 GitHub 仓库
-        for repo_name in github_repos:
-            if github_token:
-                try:
-                    commits = get_github_events(repo_name, github_token, start, end)
-                    if args.author:
-                        author_lower = args.author.lower()
-                        commits = [c for c in commits if author_lower in c['author_name'].lower()]
-                    repo_to_commits[repo_name] = commits
-                    details_map: Dict[str, Tuple[List[str], int, int, str]] = {}
-                    # 远程仓库无法获取 numstat，使用占位值
-                    for c in commits:
-                        details_map[c['sha']] = ([], 0, 0, c['message'])
-                    repo_to_details[repo_name] = details_map
-                    repo_to_grouped[repo_name] = group_commits_by_date(commits)
-                except Exception as e:
-                    print(f"Error: 获取 GitHub 仓库 {repo_name} 失败: {e}")
-        
-        # 处理 Gitee 仓库
-        for repo_name in gitee_repos:
-            if gitee_token:
-                try:
-                    commits = get_gitee_events(repo_name, gitee_token, start, end)
-                    if args.author:
-                        author_lower = args.author.lower()
-                        commits = [c for c in commits if author_lower in c['author_name'].lower()]
-                    repo_to_commits[repo_name] = commits
-                    details_map: Dict[str, Tuple[List[str], int, int, str]] = {}
-                    # 远程仓库无法获取 numstat，使用占位值
-                    for c in commits:
-                        details_map[c['sha']] = ([], 0, 0, c['message'])
-                    repo_to_details[repo_name] = details_map
-                    repo_to_grouped[repo_name] = group_commits_by_date(commits)
-                except Exception as e:
-                    print(f"Error: 获取 Gitee 仓库 {repo_name} 失败: {e}")
+        # 处理 GitHub / Gitee 仓库（获取失败的仓库已打印错误并跳过）
+        for repo_name, future in remote_futures:
+            remote = future.result()
+            if remote is None:
+                continue
+            repo_to_commits[repo_name], repo_to_details[repo_name] = remote
+            repo_to_grouped[repo_name] = group_commits_by_date(remote[0])
         
         grouped = repo_to_grouped  # type: ignore
         details = repo_to_details  # type: ignore
         # 保存 repo_to_pull_times 以便后续使用
         repo_to_pull_times_multi = repo_to_pull_times  # type: ignore
+        # 会话与并行时段只计算一次，渲染与 AI 总结共用
+        repo_to_sessions_multi = compute_repo_sessions(repo_to_grouped, args.session_gap_minutes, repo_to_pull_times)
+        parallel_periods_multi = detect_parallel_sessions(repo_to_sessions_multi)
 
     title = args.title or (f"Work Log: {start.date()} to {end.date()}" if start and end else "Work Log")
     
-    # 生成总结（如果需要）
-    summary_text = None
-    if args.add_summary:
-        print("正在生成 AI 总结...")
-        # 读取自定义提示词（如果有）
-        system_prompt = None
-        if args.system_prompt_file and os.path.exists(args.system_prompt_file):
-            with open(args.system_prompt_file, 'r', encoding='utf-8') as f:
-                system_prompt = f.read()
-        
-        # 准备 repo_to_pull_times（仅在多项目模式下使用）
-        repo_to_pull_times_for_summary = repo_to_pull_times_multi if multi_project else None
-        
-        if getattr(args, 'provider', 'openai') == 'deepseek':
-            summary_text = generate_summary_with_deepseek(
-                grouped,  # type: ignore
-                details,  # type: ignore
+    # 生成总结（如果需要）：在后台线程调用 LLM，同时渲染确定性的工作日志正文
+    summary_future = None
+    summary_deltas: "queue.Queue[str]" = queue.Queue()
+    with ThreadPoolExecutor(max_workers=1) as summary_ex:
+        if args.add_summary:
+            print("正在生成 AI 总结...")
+            # 读取自定义提示词（如果有）
+            system_prompt = None
+            if args.system_prompt_file and os.path.exists(args.system_prompt_file):
+                with open(args.system_prompt_file, 'r', encoding='utf-8') as f:
+                    system_prompt = f.read()
+            
+            # 准备 repo_to_pull_times 与预先计算的会话（仅在多项目模式下使用）
+            repo_to_pull_times_for_summary = repo_to_pull_times_multi if multi_project else None
+            repo_to_sessions_for_summary = repo_to_sessions_multi if multi_project else None
+            parallel_periods_for_summary = parallel_periods_multi if multi_project else None
+            # 流式增量先进入队列，正文输出后由主线程依次追加到文件（并回显到终端）或 stdout
+            on_delta = summary_deltas.put
+            
+            if getattr(args, 'provider', 'openai') == 'deepseek':
+                summary_fn = generate_summary_with_deepseek
+                provider_kwargs = {'deepseek_api_key': args.deepseek_key, 'model': args.deepseek_model}
+            else:
+                summary_fn = generate_summary_with_openai
+                provider_kwargs = {'openai_api_key': args.openai_key, 'model': args.openai_model}
+            summary_kwargs = dict(
+                provider_kwargs,
                 system_prompt=system_prompt,
-                deepseek_api_key=args.deepseek_key,
-                model=args.deepseek_model,
                 author=args.author,
                 gap_minutes=args.session_gap_minutes,
-                repo_to_pull_times=repo_to_pull_times_for_summary
+                use_cache=not args.no_cache_summary,
+                cache_ttl_days=args.summary_cache_ttl_days,
+                max_commits_per_day=args.max_commits_per_day,
+                max_body_chars=args.max_body_chars,
+                max_context_tokens=args.max_context_tokens
             )
+            
+            if multi_project and args.summary_per_project:
+                # 每个项目单独调用 LLM（并发），各自的提示词更短；多个流无法有序交错输出，因此不使用流式回调
+                summary_future = summary_ex.submit(
+                    generate_summaries_per_project,
+                    summary_fn,
+                    grouped,  # type: ignore
+                    details,  # type: ignore
+                    repo_to_pull_times_multi,
+                    repo_to_sessions_multi,
+                    parallel_periods_multi,
+                    requests_per_minute=args.summary_rpm,
+                    **summary_kwargs
+                )
+            else:
+                summary_future = summary_ex.submit(
+                    summary_fn,
+                    grouped,  # type: ignore
+                    details,  # type: ignore
+                    repo_to_pull_times=repo_to_pull_times_for_summary,
+                    repo_to_sessions=repo_to_sessions_for_summary,
+                    parallel_periods=parallel_periods_for_summary,
+                    on_delta=on_delta,
+                    **summary_kwargs
+                )
+        
+        if not multi_project:
+            md = render_markdown_worklog(title, grouped, details)  # type: ignore
         else:
-            summary_text = generate_summary_with_openai(
-                grouped,  # type: ignore
-                details,  # type: ignore
-                system_prompt=system_prompt,
-                openai_api_key=args.openai_key,
-                model=args.openai_model,
-                author=args.author,
-                gap_minutes=args.session_gap_minutes,
-                repo_to_pull_times=repo_to_pull_times_for_summary
-            )
-        print("AI 总结生成完成")
-    
-    if not multi_project:
-        md = render_markdown_worklog(title, grouped, details, add_summary=args.add_summary, summary_text=summary_text)  # type: ignore
-    else:
-        md = render_multi_project_worklog(title, grouped, details, add_summary=args.add_summary, summary_text=summary_text, gap_minutes=args.session_gap_minutes, repo_to_pull_times=repo_to_pull_times_multi)  # type: ignore
-
-    if args.output:
-        os.makedirs(os.path.dirname(args.output), exist_ok=True) if os.path.dirname(args.output) else None
-        with open(args.output, 'w', encoding='utf-8') as f:
-            f.write(md)
-        print(f"已写入: {args.output}")
-    else:
-        print(md)
+            md = render_multi_project_worklog(title, grouped, details, gap_minutes=args.session_gap_minutes, repo_to_pull_times=repo_to_pull_times_multi, repo_to_sessions=repo_to_sessions_multi, parallel_periods=parallel_periods_multi)  # type: ignore
+        
+        if args.output:
+            out_dir = os.path.dirname(args.output)
+            if out_dir:
+                os.makedirs(out_dir, exist_ok=True)
+            # 正文只编码一次，直接写文件描述符（流式增量本就逐段落盘，无需再经过文本缓冲层）
+            fd = os.open(args.output, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+            try:
+                body_end = _write_all(fd, md.encode('utf-8'))
+                if summary_future is not None:
+                    # 正文先落盘，总结随 LLM 输出逐段追加（同时回显到终端）
+                    _write_all(fd, b"\n")
+                    for delta in _drain_summary_deltas(summary_deltas, summary_future):
+                        _write_all(fd, delta.encode('utf-8'))
+                        print(delta, end='', flush=True)
+                    summary_text = summary_future.result()
+                    print()  # 结束流式输出的最后一行
+                    print("AI 总结生成完成")
+                    # 以最终结果（去除首尾空白；命中缓存或出错时没有流式增量）覆盖流式写入的内容，
+                    # 与渲染函数的 add_summary/summary_text 拼接方式一致
+                    os.lseek(fd, body_end, os.SEEK_SET)
+                    end = body_end + (_write_all(fd, ("\n" + summary_text).encode('utf-8')) if summary_text else 0)
+                    os.ftruncate(fd, end)
+            finally:
+                os.close(fd)
+            print(f"已写入: {args.output}")
+        else:
+            sys.stdout.write(md)
+            if summary_future is not None:
+                # 正文先输出，总结随 LLM 输出逐段写到 stdout；首尾空白按最终结果的 strip() 处理
+                streamed: List[str] = []
+                for piece in _stripped_deltas(_drain_summary_deltas(summary_deltas, summary_future)):
+                    if not streamed:
+                        sys.stdout.write("\n")
+                    streamed.append(piece)
+                    sys.stdout.write(piece)
+                    sys.stdout.flush()
+                summary_text = summary_future.result()
+                # 命中缓存或出错时没有（完整的）流式增量，补充输出最终结果
+                if summary_text and "".join(streamed) != summary_text:
+                    sys.stdout.write("\n" + summary_text)
+                sys.stdout.write("\n")
+                print("AI 总结生成完成")
+            else:
+                sys.stdout.write("\n")
 
 if __name__ == "__main__":
     git2work()
\ No newline at end of file
@@ -14,23 +14,121 @@ PyGithub 活动抓取/汇总工具
 
 认证:
   export GITHUB_TOKEN=xxxx
+  （提供 token 时，cross-repos / repos-by-author 通过 GraphQL 分页获取提交，每次请求最多 100 条；
+   未提供 token 或 GraphQL 出错时回退到 REST）
 """
 
 import os
 import sys
 import csv
 import time
+import json
+import hashlib
+import sqlite3
+import threading
 import argparse
-from datetime import datetime, timezone
-from typing import List, Optional, Dict, Any, Tuple, DefaultDict
+import heapq
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Optional, Dict, Any, Tuple, DefaultDict, Iterable, Iterator, NamedTuple
 from collections import defaultdict, Counter
+from itertools import chain, islice
+from concurrent.futures import ThreadPoolExecutor
 
+import requests
 from github import Auth, Github, GithubException, RateLimitExceededException
+from github.Requester import HTTPRequestsConnectionClass, HTTPSRequestsConnectionClass, Requester, RequestsResponse
 from dateutil import parser as dateparser
 
 
+# --------- REST 响应缓存（ETag 条件请求） ---------
+# GET 响应按 (token, URL) 缓存 ETag 与响应体；再次请求时带上 If-None-Match，
+# 未变化时 GitHub 返回 304（不计入速率限制），直接使用缓存的响应体
+ETAG_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "git2work", "github_etags.sqlite")
+# 304 响应可能不带这些头，需要随缓存一起恢复（Link 用于分页）
+_CACHED_HEADERS = ("Link", "Content-Type")
+_etag_local = threading.local()
+
+def _etag_cache_conn() -> Optional[sqlite3.Connection]:
+    """
+    当前线程的缓存连接（SQLite 连接不宜跨线程共享）；打开失败时返回 None，不使用缓存。
+    """
+    if not hasattr(_etag_local, "conn"):
+        try:
+            os.makedirs(os.path.dirname(ETAG_CACHE_PATH), exist_ok=True)
+            conn = sqlite3.connect(ETAG_CACHE_PATH, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, etag TEXT NOT NULL, headers TEXT NOT NULL, body BLOB NOT NULL)"
+            )
+            _etag_local.conn = conn
+        except (OSError, sqlite3.Error) as e:
+            print(f"[warn] 打开响应缓存失败，将不使用缓存: {e}", file=sys.stderr)
+            _etag_local.conn = None
+    return _etag_local.conn
+
+class ETagCachingHTTPSConnection(HTTPSRequestsConnectionClass):
+    """
+    PyGithub 的 HTTPS 连接类：GET 请求走 ETag 缓存。
+    注入自定义连接类后 PyGithub 会为每个请求新建连接对象，因此所有实例共用一个 requests.Session 以保持 keep-alive。
+    """
+    _shared_session: Optional[requests.Session] = None
+    _session_lock = threading.Lock()
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        cls = ETagCachingHTTPSConnection
+        with cls._session_lock:
+            if cls._shared_session is None:
+                cls._shared_session = self.session
+            else:
+                self.session.close()
+                self.session = cls._shared_session
+
+    def close(self) -> None:
+        # 共享的 Session 不随单个连接对象关闭
+        pass
+
+    def getresponse(self) -> RequestsResponse:
+        conn = _etag_cache_conn() if self.verb == "GET" else None
+        if conn is None or "If-None-Match" in self.headers:
+            return super().getresponse()
+        ident = f"{self.headers.get('Authorization', '')}\n{self.host}{self.url}"
+        key = hashlib.sha256(ident.encode("utf-8")).hexdigest()
+        cached = conn.execute("SELECT etag, headers, body FROM responses WHERE key = ?", (key,)).fetchone()
+        if cached:
+            self.headers = dict(self.headers, **{"If-None-Match": cached[0]})
+        resp = super().getresponse()
+        r = resp.response
+        if r.status_code == 304 and cached:
+            r.status_code = 200
+            r._content = cached[2]
+            r.encoding = "utf-8"
+            r.headers.update(json.loads(cached[1]))
+            return RequestsResponse(r)
+        etag = r.headers.get("ETag")
+        if r.status_code == 200 and etag:
+            headers = {h: r.headers[h] for h in _CACHED_HEADERS if h in r.headers}
+            try:
+                with conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO responses (key, etag, headers, body) VALUES (?, ?, ?, ?)",
+                        (key, etag, json.dumps(headers), r.content),
+                    )
+            except sqlite3.Error as e:
+                print(f"[warn] 写入响应缓存失败: {e}", file=sys.stderr)
+        return resp
+
+
 # --------- 通用工具 ---------
-def gh_client() -> Github:
+def gh_client(use_cache: bool = True) -> Github:
+    """
+    use_cache 为 True 时，REST GET 请求使用 ETag 条件请求缓存（见 ETagCachingHTTPSConnection）。
+    """
+    if use_cache:
+        Requester.injectConnectionClasses(HTTPRequestsConnectionClass, ETagCachingHTTPSConnection)
+    else:
+        Requester.resetConnectionClasses()
     token = os.getenv("GITHUB_TOKEN")
     if not token:
         return Github(per_page=100)
@@ -39,42 +137,473 @@ def gh_client() -> Github:
     return Github(auth=auth, per_page=100)
 
 def parse_dt(s: Optional[str]) -> Optional[datetime]:
+    """
+    GitHub 返回的 ISO 8601 时间（如 2025-09-01T08:00:00Z）先走 datetime.fromisoformat，其余格式交给 dateutil。
+    """
     if not s:
         return None
-    dt = dateparser.parse(s)
+    try:
+        dt = datetime.fromisoformat(s[:-1] + "+00:00" if s.endswith("Z") else s)
+    except ValueError:
+        dt = dateparser.parse(s)
     if not dt.tzinfo:
         dt = dt.replace(tzinfo=timezone.utc)
     return dt
 
-def rate_limit_guard(g: Github, min_core_remaining: int = 5, sleep_sec: int = 10):
+# /rate_limit 查询结果缓存（多线程共用）；reset 为 core 配额重置时间
+RATE_LIMIT_TTL = 30
+_RL_CACHE: Dict[str, Any] = {"ts": 0.0, "remaining": None, "reset": None}
+_RL_LOCK = threading.Lock()
+
+def rate_limit_guard(g: Github, min_core_remaining: int = 5, sleep_sec: int = 10, ttl: int = RATE_LIMIT_TTL):
     """
     简易速率限制保护: core 剩余过少时 sleep，直到 reset。
+    /rate_limit 的结果缓存 ttl 秒；缓存期内再参考 PyGithub 从最近一次响应头记下的剩余次数（g.rate_limiting，不发请求），
+    两者都高于阈值时直接返回，否则重新查询。
     """
     try:
-        rl = g.get_rate_limit()
-        core_rem = rl.core.remaining
-        if core_rem <= min_core_remaining:
-            reset = rl.core.reset.replace(tzinfo=timezone.utc)
-            now = datetime.now(timezone.utc)
-            wait = max((reset - now).total_seconds(), sleep_sec)
-            print(f"[rate-limit] core 剩余 {core_rem}，休眠 {int(wait)} 秒...", file=sys.stderr)
-            time.sleep(wait)
+        with _RL_LOCK:
+            now = time.time()
+            cached = _RL_CACHE["remaining"]
+            if cached is not None and now - _RL_CACHE["ts"] < ttl and cached > min_core_remaining:
+                if g.rate_limiting[0] > min_core_remaining:
+                    return
+            rl = g.get_rate_limit()
+            core_rem = rl.core.remaining
+            _RL_CACHE.update(ts=now, remaining=core_rem, reset=rl.core.reset)
+            if core_rem <= min_core_remaining:
+                reset = rl.core.reset.replace(tzinfo=timezone.utc)
+                now_dt = datetime.now(timezone.utc)
+                wait = max((reset - now_dt).total_seconds(), sleep_sec)
+                print(f"[rate-limit] core 剩余 {core_rem}，休眠 {int(wait)} 秒...", file=sys.stderr)
+                # 持锁休眠：其他线程随后也会等到配额重置；醒来后让下一次调用重新查询
+                time.sleep(wait)
+                _RL_CACHE["remaining"] = None
     except Exception:
         pass
 
-def write_csv(rows: List[Dict[str, Any]], out_path: str, keys: Optional[List[str]] = None):
-    if not rows:
+def repo_sort(since: Optional[datetime]) -> str:
+    """
+    枚举待扫描仓库时的排序方式：指定 since 时按最近推送时间降序，配合 repos_pushed_since 提前结束枚举。
+    """
+    return "pushed" if since else "updated"
+
+def repos_pushed_since(repos: Iterable[Any], since: Optional[datetime]) -> Iterator[Any]:
+    """
+    过滤掉 since 之后没有推送的仓库（pushed_at 随仓库列表一起返回，无额外请求）。
+    仓库须按 pushed 降序枚举（见 repo_sort）：遇到第一个 pushed_at 早于 since 的仓库即停止，
+    不再请求后续分页。从未推送过的仓库（pushed_at 为空）直接跳过。
+    """
+    if since is None:
+        yield from repos
+        return
+    for repo in repos:
+        pushed = getattr(repo, "pushed_at", None)
+        if pushed is None:
+            continue
+        if pushed.tzinfo is None:
+            pushed = pushed.replace(tzinfo=timezone.utc)
+        if pushed < since:
+            return
+        yield repo
+
+# 按仓库并发请求的线程数（受 GitHub 次级速率限制约束，不宜过大）
+GH_WORKERS = int(os.getenv("GH_WORKERS", "8"))
+
+def iter_pages(plist: Any, per_page: int, max_items: Optional[int] = None) -> Iterator[Any]:
+    """
+    并发预取 PaginatedList 的各页，按原顺序逐条产出。
+    先取第 1 页（不足一页即结束）；其余页数由 totalCount 与 max_items 确定，每批至多 GH_WORKERS 页并发请求，
+    调用方停止迭代后不再发起新的批次。totalCount 不可用时逐页顺序请求，直到遇到不满一页。
+    """
+    first = plist.get_page(0)
+    yield from first
+    if len(first) < per_page:
+        return
+    max_pages = None if max_items is None else -(-max_items // per_page)
+    try:
+        # 搜索结果的 total_count 随第 1 页返回；其余列表需额外一次 per_page=1 的请求（由 Link 头得出页数）
+        n_pages = -(-plist.totalCount // per_page)
+    except Exception:
+        page_no = 1
+        while max_pages is None or page_no < max_pages:
+            page = plist.get_page(page_no)
+            yield from page
+            if len(page) < per_page:
+                return
+            page_no += 1
+        return
+    if max_pages is not None:
+        n_pages = min(n_pages, max_pages)
+    if n_pages <= 1:
+        return
+    batch = min(GH_WORKERS, n_pages - 1)
+    with ThreadPoolExecutor(max_workers=batch) as ex:
+        for start in range(1, n_pages, batch):
+            for page in ex.map(plist.get_page, range(start, min(start + batch, n_pages))):
+                yield from page
+
+
+class CommitRow(NamedTuple):
+    """
+    提交明细行（cross-repos / repo-authors 输出）。比同字段的 dict 省内存，csv.writer 可直接写出。
+    """
+    repo: str
+    sha: str
+    date: Any  # UTC datetime，缺失时为 ""
+    author_login: str
+    author_name: str
+    author_email: str
+    committer_login: str
+    title: str
+    url: str
+
+
+# --------- GraphQL ---------
+GITHUB_GRAPHQL_URL = "https://api.github.com/graphql"
+
+# 默认分支上的提交历史，一次请求返回 100 条提交及作者/提交者信息（REST 需逐页并按需懒加载）
+_COMMIT_HISTORY_QUERY = """
+query($owner: String!, $name: String!, $author: CommitAuthor, $since: GitTimestamp, $until: GitTimestamp, $cursor: String) {
+  repository(owner: $owner, name: $name) {
+    defaultBranchRef {
+      target {
+        ... on Commit {
+          history(first: 100, author: $author, since: $since, until: $until, after: $cursor) {
+            pageInfo { hasNextPage endCursor }
+            nodes {
+              oid
+              url
+              message
+              author { name email date user { login } }
+              committer { user { login } }
+            }
+          }
+        }
+      }
+    }
+  }
+}
+"""
+
+# 只取匹配提交的总数，不返回提交本身
+_COMMIT_COUNT_QUERY = """
+query($owner: String!, $name: String!, $author: CommitAuthor, $since: GitTimestamp, $until: GitTimestamp) {
+  repository(owner: $owner, name: $name) {
+    defaultBranchRef {
+      target {
+        ... on Commit {
+          history(author: $author, since: $since, until: $until) { totalCount }
+        }
+      }
+    }
+  }
+}
+"""
+
+_GQL_SESSION = requests.Session()
+_GQL_USER_IDS: Dict[str, Optional[str]] = {}  # login -> GraphQL 节点 ID（None 表示无法解析）
+
+def gql_enabled() -> bool:
+    # GraphQL API 必须认证
+    return bool(os.getenv("GITHUB_TOKEN"))
+
+def gql(query: str, variables: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    执行 GraphQL 查询并返回 data；HTTP 错误抛出 requests 异常，GraphQL 错误抛出 RuntimeError。
+    """
+    resp = _GQL_SESSION.post(
+        GITHUB_GRAPHQL_URL,
+        json={"query": query, "variables": variables},
+        headers={"Authorization": f"bearer {os.getenv('GITHUB_TOKEN')}"},
+        timeout=30,
+    )
+    resp.raise_for_status()
+    body = resp.json()
+    if body.get("errors"):
+        raise RuntimeError("; ".join(e.get("message", str(e)) for e in body["errors"]))
+    return body.get("data") or {}
+
+def gql_user_id(login: str) -> Optional[str]:
+    """
+    解析用户的 GraphQL 节点 ID（用于 history 的 author 过滤），结果按 login 缓存。
+    """
+    if login not in _GQL_USER_IDS:
+        try:
+            user = gql("query($login: String!) { user(login: $login) { id } }", {"login": login}).get("user")
+            _GQL_USER_IDS[login] = user["id"] if user else None
+        except (requests.RequestException, RuntimeError) as e:
+            print(f"[warn] GraphQL 解析用户 {login} 失败: {e}", file=sys.stderr)
+            _GQL_USER_IDS[login] = None
+    return _GQL_USER_IDS[login]
+
+_USER_CACHE: Dict[str, Any] = {}  # login -> PyGithub NamedUser
+
+def resolve_user(g: Github, login: str) -> Any:
+    """
+    获取用户对象并按 login 缓存；REST 返回的 node_id 即 GraphQL 节点 ID，顺带写入 _GQL_USER_IDS，省去 gql_user_id 的一次查询。
+    """
+    if login not in _USER_CACHE:
+        user = g.get_user(login)
+        _USER_CACHE[login] = user
+        node_id = getattr(user, "node_id", None)
+        if node_id:
+            _GQL_USER_IDS.setdefault(login, node_id)
+    return _USER_CACHE[login]
+
+def gql_commit_rows(
+    repo_full: str,
+    author_id: Optional[str],
+    since: Optional[datetime],
+    until: Optional[datetime],
+    author_email: Optional[str] = None
+) -> Iterator[CommitRow]:
+    """
+    通过 GraphQL 分页获取仓库默认分支在时间窗内的提交，逐条产出与 REST 相同字段的明细行。
+    author_id 为作者的 GraphQL 节点 ID（服务端过滤）；author_email 在本地二次过滤（不区分大小写）。
+    调用方停止迭代后不再请求后续页。空仓库（没有默认分支）不产出任何行。
+    """
+    owner, name = repo_full.split("/", 1)
+    email_lower = author_email.lower() if author_email else None
+    variables: Dict[str, Any] = {
+        "owner": owner,
+        "name": name,
+        "author": {"id": author_id} if author_id else None,
+        "since": since.isoformat() if since else None,
+        "until": until.isoformat() if until else None,
+        "cursor": None,
+    }
+    while True:
+        repository = gql(_COMMIT_HISTORY_QUERY, variables).get("repository")
+        if repository is None:
+            raise RuntimeError(f"无法访问仓库 {repo_full}")
+        ref = repository.get("defaultBranchRef")
+        if not ref:
+            return
+        history = ref["target"]["history"]
+        for node in history["nodes"]:
+            a = node.get("author") or {}
+            em = a.get("email") or ""
+            if email_lower and em.lower() != email_lower:
+                continue
+            yield CommitRow(
+                repo=repo_full,
+                sha=node["oid"],
+                # 与 REST（PyGithub）一致：作者时间转换为 UTC 的 datetime
+                date=parse_dt(a["date"]).astimezone(timezone.utc) if a.get("date") else "",
+                author_login=(a.get("user") or {}).get("login", ""),
+                author_name=a.get("name") or "",
+                author_email=em,
+                committer_login=((node.get("committer") or {}).get("user") or {}).get("login", ""),
+                title=((node.get("message") or "").splitlines() or [""])[0],
+                url=node.get("url", ""),
+            )
+        page = history["pageInfo"]
+        if not page["hasNextPage"]:
+            return
+        variables["cursor"] = page["endCursor"]
+
+def gql_commit_count(
+    repo_full: str,
+    author_id: Optional[str],
+    since: Optional[datetime],
+    until: Optional[datetime]
+) -> int:
+    """
+    一次 GraphQL 请求返回默认分支在时间窗内（可按作者节点 ID 过滤）的提交数；空仓库返回 0。
+    """
+    owner, name = repo_full.split("/", 1)
+    repository = gql(_COMMIT_COUNT_QUERY, {
+        "owner": owner,
+        "name": name,
+        "author": {"id": author_id} if author_id else None,
+        "since": since.isoformat() if since else None,
+        "until": until.isoformat() if until else None,
+    }).get("repository")
+    if repository is None:
+        raise RuntimeError(f"无法访问仓库 {repo_full}")
+    ref = repository.get("defaultBranchRef")
+    if not ref:
+        return 0
+    return ref["target"]["history"]["totalCount"]
+
+def gql_author_filter(author_login: Optional[str]) -> Tuple[bool, Optional[str]]:
+    """
+    返回 (是否使用 GraphQL, 作者节点 ID)。未提供 token 或无法解析作者时回退到 REST。
+    """
+    if not gql_enabled():
+        return False, None
+    if not author_login:
+        return True, None
+    author_id = gql_user_id(author_login)
+    return author_id is not None, author_id
+
+# CSV 输出文件的写缓冲大小（字节），可通过环境变量 GH_CSV_BUFSIZE 调整
+CSV_BUFSIZE = int(os.getenv("GH_CSV_BUFSIZE", str(1 << 20)))
+
+# 流式写入 CSV 时每批的行数
+CSV_BATCH_ROWS = 1000
+
+def write_csv(rows: Iterable[Any], out_path: str, keys: Optional[List[str]] = None):
+    """
+    rows 可以是列表或生成器：按批写入文件，生成器不会被整体物化，内存占用与总行数无关。
+    行可以是 dict，也可以是 CommitRow 这类 NamedTuple（字段顺序与 keys 一致时原样写出）。
+    """
+    it = iter(rows)
+    first = next(it, None)
+    if first is None:
         print(f"[info] 无数据，未生成 {out_path}")
         return
+    fields = list(first._fields) if isinstance(first, tuple) else None
     if keys is None:
         # 默认取第一条的键
-        keys = list(rows[0].keys())
-    with open(out_path, "w", newline="", encoding="utf-8") as f:
-        w = csv.DictWriter(f, fieldnames=keys)
-        w.writeheader()
-        for r in rows:
-            w.writerow({k: r.get(k, "") for k in keys})
-    print(f"[ok] 导出 {len(rows)} 条记录到 {out_path}")
+        keys = fields if fields is not None else list(first.keys())
+    if fields is None:
+        def project(batch):
+            return ([r.get(k, "") for k in keys] for r in batch)
+    elif keys == fields:
+        def project(batch):
+            return batch
+    else:
+        def project(batch):
+            return ([getattr(r, k, "") for k in keys] for r in batch)
+    count = 0
+    with open(out_path, "w", newline="", encoding="utf-8", buffering=CSV_BUFSIZE) as f:
+        # 直接写列表行，避免 DictWriter 为每行再构造一次字典
+        w = csv.writer(f)
+        w.writerow(keys)
+        it = chain((first,), it)
+        while True:
+            batch = list(islice(it, CSV_BATCH_ROWS))
+            if not batch:
+                break
+            w.writerows(project(batch))
+            count += len(batch)
+    print(f"[ok] 导出 {count} 条记录到 {out_path}")
+
+
+def _commit_row(c: Any, repo_full: str) -> CommitRow:
+    """
+    把 PyGithub 的 Commit 转成明细行：每条属性链只访问一次（c.commit / c.commit.author 等可能触发懒加载）。
+    """
+    commit = c.commit
+    a = commit.author
+    author = c.author
+    committer = c.committer
+    return CommitRow(
+        repo=repo_full,
+        sha=c.sha,
+        date=a.date if a else "",
+        author_login=author.login if author else "",
+        author_name=a.name if a else "",
+        author_email=a.email if a else "",
+        committer_login=committer.login if committer else "",
+        title=((commit.message or "").splitlines() or [""])[0],
+        url=c.html_url,
+    )
+
+
+# --------- 提交明细缓存（SQLite） ---------
+# 提交由 (repo, sha) 唯一确定：cross-repos / repo-authors 抓到的明细行写入本地库，--cache-only 时直接从库中导出，不发请求
+COMMIT_ROWS_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "git2work", "github_commits.sqlite")
+
+def commit_rows_cache_open() -> Optional[sqlite3.Connection]:
+    """
+    打开提交明细缓存；失败（如目录不可写）时返回 None，调用方退化为不使用缓存。
+    """
+    try:
+        os.makedirs(os.path.dirname(COMMIT_ROWS_CACHE_PATH), exist_ok=True)
+        conn = sqlite3.connect(COMMIT_ROWS_CACHE_PATH, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS commits ("
+            "repo TEXT NOT NULL, sha TEXT NOT NULL, date TEXT NOT NULL, author_login TEXT NOT NULL, "
+            "author_name TEXT NOT NULL, author_email TEXT NOT NULL, committer_login TEXT NOT NULL, "
+            "title TEXT NOT NULL, url TEXT NOT NULL, PRIMARY KEY (repo, sha))"
+        )
+        return conn
+    except (OSError, sqlite3.Error) as e:
+        print(f"[warn] 打开提交明细缓存失败，将不使用缓存: {e}", file=sys.stderr)
+        return None
+
+def store_commit_rows(rows: Iterable[CommitRow], conn: sqlite3.Connection) -> Iterator[CommitRow]:
+    """
+    原样转发 rows，同时按批写入缓存（每批一个事务）；写入失败只告警，不影响导出。
+    """
+    batch: List[CommitRow] = []
+
+    def flush():
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO commits (repo, sha, date, author_login, author_name, author_email, "
+                    "committer_login, title, url) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(r.repo, r.sha, r.date.isoformat() if r.date else "", r.author_login or "", r.author_name or "",
+                      r.author_email or "", r.committer_login or "", r.title, r.url or "") for r in batch],
+                )
+        except sqlite3.Error as e:
+            print(f"[warn] 写入提交明细缓存失败: {e}", file=sys.stderr)
+        batch.clear()
+
+    for r in rows:
+        batch.append(r)
+        if len(batch) >= CSV_BATCH_ROWS:
+            flush()
+        yield r
+    if batch:
+        flush()
+
+def cached_commit_rows(
+    conn: sqlite3.Connection,
+    repo_full: Optional[str] = None,
+    owner: Optional[str] = None,
+    authors_login: Optional[List[str]] = None,
+    authors_emails: Optional[List[str]] = None,
+    match_all: bool = False,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    max_per_key: Optional[int] = None,
+) -> Iterator[CommitRow]:
+    """
+    从缓存读取明细行（按仓库、时间倒序），只包含此前运行抓到过的提交。
+    match_all 为 True 时 login 与邮箱都须匹配（同 cross-repos，max_per_key 按仓库计）；
+    否则任一匹配即可（同 repo-authors，max_per_key 按作者计）。login / 邮箱不区分大小写。
+    """
+    where: List[str] = []
+    params: List[Any] = []
+    if repo_full:
+        where.append("lower(repo) = lower(?)")
+        params.append(repo_full)
+    elif owner:
+        where.append("lower(substr(repo, 1, ?)) = lower(?)")
+        params += [len(owner) + 1, owner + "/"]
+    author_conds: List[str] = []
+    if authors_login:
+        author_conds.append(f"lower(author_login) IN ({','.join('?' * len(authors_login))})")
+        params += [x.lower() for x in authors_login]
+    if authors_emails:
+        author_conds.append(f"lower(author_email) IN ({','.join('?' * len(authors_emails))})")
+        params += [x.lower() for x in authors_emails]
+    if author_conds:
+        where.append("(" + (" AND " if match_all else " OR ").join(author_conds) + ")")
+    sql = ("SELECT repo, sha, date, author_login, author_name, author_email, committer_login, title, url FROM commits"
+           + (" WHERE " + " AND ".join(where) if where else "") + " ORDER BY repo, date DESC")
+
+    logins = {x.lower() for x in authors_login or []}
+    counts: Counter[str] = Counter()
+    for rec in conn.execute(sql, params):
+        row = CommitRow(*rec)._replace(date=parse_dt(rec[2]) or "")
+        if row.date and ((since and row.date < since) or (until and row.date > until)):
+            continue
+        if max_per_key is not None:
+            if match_all:
+                key = row.repo
+            else:
+                key = row.author_login.lower() if row.author_login.lower() in logins else row.author_email.lower()
+            if counts[key] >= max_per_key:
+                continue
+            counts[key] += 1
+        yield row
 
 
 # --------- 1) 跨仓：不同仓库同一作者（明细） ----------
@@ -86,9 +615,9 @@ def fetch_user_activity_across_repos(
     until: Optional[datetime],
     owner: Optional[str],
     repo_type: str = "owner",   # owner | member | all | public | private
-    max_per_repo: int = 1000
-) -> List[Dict[str, Any]]:
-    rows: List[Dict[str, Any]] = []
+    max_per_repo: int = 1000,
+    include_archived: bool = False
+) -> Iterator[CommitRow]:
 
     # 仓库来源
     if owner:
@@ -96,53 +625,64 @@ def fetch_user_activity_across_repos(
             user_or_org = g.get_user(owner)
         except GithubException:
             user_or_org = g.get_organization(owner)
-        repos = user_or_org.get_repos(type=repo_type, sort="updated")
+        repos = user_or_org.get_repos(type=repo_type, sort=repo_sort(since))
     else:
         if not author_login:
             raise ValueError("未提供 owner 时，必须提供 author_login 才能枚举其仓库。")
-        user = g.get_user(author_login)
-        repos = user.get_repos(type=repo_type, sort="updated")
+        user = resolve_user(g, author_login)
+        repos = user.get_repos(type=repo_type, sort=repo_sort(since))
+    repos = repos_pushed_since(repos, since)
+    if not include_archived:
+        # archived 字段随仓库列表返回，过滤无额外请求
+        repos = (r for r in repos if not r.archived)
 
-    for repo in repos:
+    use_gql, author_id = gql_author_filter(author_login)
+
+    def scan(repo) -> List[CommitRow]:
         rate_limit_guard(g)
         full = repo.full_name
-        try:
-            if author_login:
-                commits = repo.get_commits(author=author_login, since=since, until=until)
-            else:
-                commits = repo.get_commits(since=since, until=until)
-
-            cnt = 0
-            for c in commits:
-                # email 二次过滤（如果指定）
-                if author_email:
-                    a = getattr(c.commit, "author", None)
-                    em = getattr(a, "email", None) if a else None
-                    if not em or em.lower() != author_email.lower():
-                        continue
-
-                rows.append({
-                    "repo": full,
-                    "sha": c.sha,
-                    "date": getattr(c.commit.author, "date", ""),
-                    "author_login": c.author.login if c.author else "",
-                    "author_name": getattr(getattr(c.commit, "author", None), "name", ""),
-                    "author_email": getattr(getattr(c.commit, "author", None), "email", ""),
-                    "committer_login": c.committer.login if c.committer else "",
-                    "title": (c.commit.message or "").splitlines()[0],
-                    "url": c.html_url,
-                })
-                cnt += 1
-                if cnt >= max_per_repo:
-                    break
+        if use_gql:
+            try:
+                return list(islice(gql_commit_rows(full, author_id, since, until, author_email), max_per_repo))
+            except (requests.RequestException, RuntimeError) as e:
+                print(f"[warn] {full}: GraphQL 查询失败，改用 REST: {e}", file=sys.stderr)
+        for attempt in range(2):
+            repo_rows: List[CommitRow] = []
+            try:
+                if author_login:
+                    commits = repo.get_commits(author=author_login, since=since, until=until)
+                else:
+                    commits = repo.get_commits(since=since, until=until)
+
+                cnt = 0
+                for c in commits:
+                    # email 二次过滤（如果指定）
+                    if author_email:
+                        a = getattr(c.commit, "author", None)
+                        em = getattr(a, "email", None) if a else None
+                        if not em or em.lower() != author_email.lower():
+                            continue
+
+                    repo_rows.append(_commit_row(c, full))
+                    cnt += 1
+                    if cnt >= max_per_repo:
+                        break
+                return repo_rows
+
+            except RateLimitExceededException:
+                # 等待速率限制重置后重试一次该仓库
+                rate_limit_guard(g, min_core_remaining=100, sleep_sec=30)
+            except GithubException as e:
+                # 空仓库（没有任何提交）返回 409，直接视为无提交
+                if e.status != 409:
+                    print(f"[warn] 跳过 {full}: {e}", file=sys.stderr)
+                break
+        return []
 
-        except RateLimitExceededException:
-            rate_limit_guard(g, min_core_remaining=100, sleep_sec=30)
-            continue
-        except GithubException as e:
-            print(f"[warn] 跳过 {full}: {e}", file=sys.stderr)
-            continue
-    return rows
+    # 各仓库的请求互不依赖且以网络等待为主，用线程池重叠；结果按仓库枚举顺序合并
+    with ThreadPoolExecutor(max_workers=GH_WORKERS) as ex:
+        for repo_rows in ex.map(scan, repos):
+            yield from repo_rows
 
 
 # --------- 2) 单仓：同一仓库不同作者（明细） ----------
@@ -154,8 +694,7 @@ def fetch_repo_activity_across_authors(
     since: Optional[datetime] = None,
     until: Optional[datetime] = None,
     max_per_author: int = 1000
-) -> List[Dict[str, Any]]:
-    rows: List[Dict[str, Any]] = []
+) -> Iterator[CommitRow]:
     repo = g.get_repo(repo_full)
 
     authors_login = list({a for a in (authors_login or []) if a})
@@ -165,18 +704,14 @@ def fetch_repo_activity_across_authors(
     if not authors_login and not authors_emails:
         commits = repo.get_commits(since=since, until=until)
         for c in commits:
-            rows.append({
-                "repo": repo_full,
-                "sha": c.sha,
-                "date": getattr(c.commit.author, "date", ""),
-                "author_login": c.author.login if c.author else "",
-                "author_name": getattr(getattr(c.commit, "author", None), "name", ""),
-                "author_email": getattr(getattr(c.commit, "author", None), "email", ""),
-                "committer_login": c.committer.login if c.committer else "",
-                "title": (c.commit.message or "").splitlines()[0],
-                "url": c.html_url,
-            })
-        return rows
+            yield _commit_row(c, repo_full)
+        return
+
+    # 同一提交可能同时命中多个 login 或 login 与邮箱，按 sha 去重
+    seen: set = set()
+    # login 阶段见到的邮箱；邮箱全部被覆盖且没有截断时，GitHub 已把这些邮箱的提交都关联到 login，邮箱补漏可以跳过
+    covered_emails: set = set()
+    truncated = False
 
     # 1) 先按 login 拉
     for login in (authors_login or []):
@@ -191,26 +726,22 @@ def fetch_repo_activity_across_authors(
                     em = getattr(a, "email", None) if a else None
                     if not em or (em.lower() not in authors_emails):
                         continue
+                    covered_emails.add(em.lower())
+                if c.sha in seen:
+                    continue
+                seen.add(c.sha)
 
-                rows.append({
-                    "repo": repo_full,
-                    "sha": c.sha,
-                    "date": getattr(c.commit.author, "date", ""),
-                    "author_login": c.author.login if c.author else "",
-                    "author_name": getattr(getattr(c.commit, "author", None), "name", ""),
-                    "author_email": getattr(getattr(c.commit, "author", None), "email", ""),
-                    "committer_login": c.committer.login if c.committer else "",
-                    "title": (c.commit.message or "").splitlines()[0],
-                    "url": c.html_url,
-                })
+                yield _commit_row(c, repo_full)
                 cnt += 1
                 if cnt >= max_per_author:
+                    truncated = True
                     break
         except GithubException as e:
+            truncated = True
             print(f"[warn] login {login}: {e}", file=sys.stderr)
 
-    # 2) 仅邮箱（补漏）
-    if authors_emails:
+    # 2) 仅邮箱（补漏）：需要遍历时间窗内全部提交，邮箱已被 login 阶段完整覆盖时跳过
+    if authors_emails and (truncated or not covered_emails.issuperset(authors_emails)):
         try:
             commits = repo.get_commits(since=since, until=until)
             cnt = 0
@@ -219,25 +750,16 @@ def fetch_repo_activity_across_authors(
                 em = getattr(a, "email", None) if a else None
                 if not em or (em.lower() not in authors_emails):
                     continue
-                rows.append({
-                    "repo": repo_full,
-                    "sha": c.sha,
-                    "date": getattr(c.commit, "date", ""),
-                    "author_login": c.author.login if c.author else "",
-                    "author_name": getattr(a, "name", ""),
-                    "author_email": em,
-                    "committer_login": c.committer.login if c.committer else "",
-                    "title": (c.commit.message or "").splitlines()[0],
-                    "url": c.html_url,
-                })
+                if c.sha in seen:
+                    continue
+                seen.add(c.sha)
+                yield _commit_row(c, repo_full)
                 cnt += 1
                 if cnt >= max_per_author:
                     break
         except GithubException as e:
             print(f"[warn] email pass: {e}", file=sys.stderr)
 
-    return rows
-
 
 # --------- 3) 新增：同一作者在哪些仓库（列表） ----------
 def list_repos_for_author(
@@ -248,7 +770,8 @@ def list_repos_for_author(
     until: Optional[datetime],
     owner: Optional[str],
     repo_type: str = "owner",   # owner | member | all | public | private
-    min_commits: int = 1
+    min_commits: int = 1,
+    include_archived: bool = False
 ) -> List[Dict[str, Any]]:
     """
     输出：有该作者提交活动的仓库列表 + 提交数（按降序）。
@@ -268,49 +791,69 @@ def list_repos_for_author(
             except GithubException as e:
                 print(f"[error] 无法找到用户或组织 '{owner}': {e}", file=sys.stderr)
                 return []
-        repos = user_or_org.get_repos(type=repo_type, sort="updated")
-        repo_list = list(repos)
+        repos = user_or_org.get_repos(type=repo_type, sort=repo_sort(since))
+        repo_list = [r for r in repos_pushed_since(repos, since) if include_archived or not r.archived]
         print(f"[info] 找到 {len(repo_list)} 个仓库（类型: {repo_type}）", file=sys.stderr)
     else:
         if not author_login:
             raise ValueError("未提供 owner 时，必须提供 author_login 才能枚举其仓库。")
-        user = g.get_user(author_login)
-        repos = user.get_repos(type=repo_type, sort="updated")
-        repo_list = list(repos)
+        user = resolve_user(g, author_login)
+        repos = user.get_repos(type=repo_type, sort=repo_sort(since))
+        repo_list = [r for r in repos_pushed_since(repos, since) if include_archived or not r.archived]
         print(f"[info] 从作者 {author_login} 找到 {len(repo_list)} 个仓库", file=sys.stderr)
 
-    checked_count = 0
-    for repo in repo_list:
+    use_gql, author_id = gql_author_filter(author_login)
+
+    def count_commits(repo) -> Optional[int]:
+        """返回该仓库中匹配的提交数；仓库无法访问时返回 None。"""
         rate_limit_guard(g)
         full = repo.full_name
-        checked_count += 1
-        try:
-            if author_login:
-                commits = repo.get_commits(author=author_login, since=since, until=until)
-            else:
-                commits = repo.get_commits(since=since, until=until)
-
-            repo_count = 0
-            for c in commits:
+        if use_gql:
+            try:
                 if author_email:
-                    a = getattr(c.commit, "author", None)
-                    em = getattr(a, "email", None) if a else None
-                    if not em or em.lower() != author_email.lower():
-                        continue
-                repo_count += 1
+                    # 邮箱需要在本地逐条比对
+                    return sum(1 for _ in gql_commit_rows(full, author_id, since, until, author_email))
+                return gql_commit_count(full, author_id, since, until)
+            except (requests.RequestException, RuntimeError) as e:
+                print(f"[warn] {full}: GraphQL 查询失败，改用 REST: {e}", file=sys.stderr)
+        for attempt in range(2):
+            try:
+                if author_login:
+                    commits = repo.get_commits(author=author_login, since=since, until=until)
+                else:
+                    commits = repo.get_commits(since=since, until=until)
+
+                repo_count = 0
+                for c in commits:
+                    if author_email:
+                        a = getattr(c.commit, "author", None)
+                        em = getattr(a, "email", None) if a else None
+                        if not em or em.lower() != author_email.lower():
+                            continue
+                    repo_count += 1
+                return repo_count
+
+            except RateLimitExceededException:
+                # 等待速率限制重置后重试一次该仓库
+                rate_limit_guard(g, min_core_remaining=100, sleep_sec=30)
+            except GithubException as e:
+                if e.status == 409:
+                    # 空仓库（没有任何提交）
+                    return 0
+                print(f"[warn] 跳过 {full}: {e}", file=sys.stderr)
+                break
+        return None
 
-            if repo_count > 0:
-                print(f"[info] {full}: 找到 {repo_count} 个提交（阈值: {min_commits}）", file=sys.stderr)
-            
+    checked_count = len(repo_list)
+    # 各仓库并发统计，结果按仓库枚举顺序处理
+    with ThreadPoolExecutor(max_workers=GH_WORKERS) as ex:
+        for repo, repo_count in zip(repo_list, ex.map(count_commits, repo_list)):
+            if not repo_count:
+                continue
+            full = repo.full_name
+            print(f"[info] {full}: 找到 {repo_count} 个提交（阈值: {min_commits}）", file=sys.stderr)
             if repo_count >= min_commits:
                 counts[full] += repo_count
-
-        except RateLimitExceededException:
-            rate_limit_guard(g, min_core_remaining=100, sleep_sec=30)
-            continue
-        except GithubException as e:
-            print(f"[warn] 跳过 {full}: {e}", file=sys.stderr)
-            continue
     
     print(f"[info] 检查了 {checked_count} 个仓库，找到 {len(counts)} 个符合条件的仓库", file=sys.stderr)
 
@@ -338,9 +881,11 @@ def list_authors_for_repo(
 
     commits = repo.get_commits(since=since, until=until)
     for c in commits:
-        login = c.author.login if c.author else ""
-        name  = getattr(getattr(c.commit, "author", None), "name", "") or ""
-        email = getattr(getattr(c.commit, "author", None), "email", "") or ""
+        author = c.author
+        a = c.commit.author
+        login = author.login if author else ""
+        name  = (a.name if a else "") or ""
+        email = (a.email if a else "") or ""
 
         # 选择主键
         if prefer == "email" and email:
@@ -353,8 +898,11 @@ def list_authors_for_repo(
         counter[key] += 1
         meta.setdefault(key, (login, email))
 
+    # most_common() 按提交数降序：低于 min_commits 后的作者都不满足，直接结束
     rows: List[Dict[str, Any]] = []
     for key, cnt in counter.most_common():
+        if cnt < min_commits:
+            break
         login, email = meta.get(key, ("", ""))
         rows.append({
             "repo": repo_full,
@@ -363,12 +911,54 @@ def list_authors_for_repo(
             "author_email": email,
             "commits": cnt
         })
-
-    # 过滤 min_commits
-    rows = [r for r in rows if r["commits"] >= min_commits]
     return rows
 
 # --------- 5) 新增：按关键词搜索项目 ----------
+# Search API 对任意查询最多返回前 1000 条；超过时需拆分查询（分片）
+SEARCH_RESULT_CAP = 1000
+# 按 star 数分片的初始区间（hi 为 None 表示不设上限），结果仍超过上限的分片会继续二分
+SEARCH_STAR_SHARDS: List[Tuple[int, Optional[int]]] = [(0, 10), (11, 50), (51, 200), (201, 1000), (1001, None)]
+# 按推送时间分片时的最早日期（GitHub 上线时间）
+SEARCH_PUSHED_EPOCH = date(2008, 1, 1)
+
+def _shard_qualifier(shard_by: str, lo: Any, hi: Any) -> str:
+    if shard_by == "stars":
+        return f"stars:>={lo}" if hi is None else f"stars:{lo}..{hi}"
+    return f"pushed:{lo.isoformat()}..{hi.isoformat()}"
+
+def _split_shard(shard_by: str, lo: Any, hi: Any) -> Optional[List[Tuple[Any, Any]]]:
+    """
+    把分片区间二分；区间已不可再分时返回 None。
+    """
+    if shard_by == "stars":
+        if hi is None:
+            mid = lo * 2 + 1
+            return [(lo, mid), (mid + 1, None)]
+        if lo >= hi:
+            return None
+        mid = (lo + hi) // 2
+        return [(lo, mid), (mid + 1, hi)]
+    if lo >= hi:
+        return None
+    mid = lo + (hi - lo) // 2
+    return [(lo, mid), (mid + timedelta(days=1), hi)]
+
+def _search_repo_row(repo: Any) -> Dict[str, Any]:
+    return {
+        "full_name": repo.full_name,
+        "name": repo.name,
+        "owner": repo.owner.login if repo.owner else "",
+        "description": repo.description or "",
+        "language": repo.language or "",
+        "stargazers_count": repo.stargazers_count,
+        "forks_count": repo.forks_count,
+        "archived": repo.archived,
+        "private": repo.private,
+        "updated_at": getattr(repo, "updated_at", ""),
+        "pushed_at": getattr(repo, "pushed_at", ""),
+        "html_url": repo.html_url,
+    }
+
 def search_repos_by_keyword(
     g: Github,
     keyword: str,
@@ -379,19 +969,22 @@ def search_repos_by_keyword(
     owner: Optional[str] = None,
     sort: str = "updated",          # "stars" | "forks" | "updated"
     order: str = "desc",
-    limit: int = 200
+    limit: int = 200,
+    shard_by: Optional[str] = None  # None | "stars" | "pushed"
 ) -> List[Dict[str, Any]]:
     """
     使用 Search API 搜索仓库。keyword 会匹配 name/description/readme。
     可叠加 language、stars、pushed:>=、topic、owner 限制。
+    shard_by 指定时按 star 数或推送日期把查询拆成互不重叠的分片并发搜索（结果超过 1000 条的分片继续二分），
+    合并去重后在本地按 sort/order 排序再截断到 limit，用于突破 Search API 的 1000 条上限。
     """
-    # 组装 GitHub 搜索语句
+    # 组装 GitHub 搜索语句（分片维度上的限定由分片区间给出）
     q = [keyword, "in:name,description,readme"]
     if language:
         q.append(f"language:{language}")
-    if min_stars is not None:
+    if min_stars is not None and shard_by != "stars":
         q.append(f"stars:>={min_stars}")
-    if pushed_since:
+    if pushed_since and shard_by != "pushed":
         q.append(f"pushed:>={pushed_since.date().isoformat()}")
     if topic:
         q.append(f"topic:{topic}")
@@ -399,31 +992,71 @@ def search_repos_by_keyword(
         q.append(f"user:{owner}")   # 对用户；若是组织也可以，用 org: 则写 org:{owner}
     query = " ".join(q)
 
-    rows: List[Dict[str, Any]] = []
-    try:
-        results = g.search_repositories(query=query, sort=sort, order=order)
-        for i, repo in enumerate(results):
-            if i >= limit:
-                break
-            rate_limit_guard(g)
-            rows.append({
-                "full_name": repo.full_name,
-                "name": repo.name,
-                "owner": repo.owner.login if repo.owner else "",
-                "description": repo.description or "",
-                "language": repo.language or "",
-                "stargazers_count": repo.stargazers_count,
-                "forks_count": repo.forks_count,
-                "archived": repo.archived,
-                "private": repo.private,
-                "updated_at": getattr(repo, "updated_at", ""),
-                "pushed_at": getattr(repo, "pushed_at", ""),
-                "html_url": repo.html_url,
-            })
-    except GithubException as e:
-        print(f"[warn] search error: {e}", file=sys.stderr)
+    if not shard_by:
+        rows: List[Dict[str, Any]] = []
+        try:
+            results = g.search_repositories(query=query, sort=sort, order=order)
+            # Search API 最多返回前 1000 条
+            for i, repo in enumerate(iter_pages(results, g.per_page, min(limit, SEARCH_RESULT_CAP))):
+                if i >= limit:
+                    break
+                # 每页（一次请求）检查一次即可
+                if i % g.per_page == 0:
+                    rate_limit_guard(g)
+                rows.append(_search_repo_row(repo))
+        except GithubException as e:
+            print(f"[warn] search error: {e}", file=sys.stderr)
+        return rows
 
-    return rows
+    if shard_by == "stars":
+        lo_min = min_stars or 0
+        shards = [(max(lo, lo_min), hi) for lo, hi in SEARCH_STAR_SHARDS if hi is None or hi >= lo_min]
+    else:
+        start = pushed_since.date() if pushed_since else SEARCH_PUSHED_EPOCH
+        shards = [(start, datetime.now(timezone.utc).date())]
+
+    # 全局前 limit 条必然落在各分片各自的前 limit 条之内，因此每个分片只需取 min(limit, 1000) 条
+    per_shard = min(limit, SEARCH_RESULT_CAP)
+
+    def run_shard(shard: Tuple[Any, Any]) -> List[Dict[str, Any]]:
+        lo, hi = shard
+        shard_query = f"{query} {_shard_qualifier(shard_by, lo, hi)}"
+        try:
+            results = g.search_repositories(query=shard_query, sort=sort, order=order)
+            total = results.totalCount
+            if total > SEARCH_RESULT_CAP:
+                halves = _split_shard(shard_by, lo, hi)
+                if halves:
+                    return [r for half in halves for r in run_shard(half)]
+                print(f"[warn] 分片 {_shard_qualifier(shard_by, lo, hi)} 有 {total} 条结果，无法再拆分，只取前 {SEARCH_RESULT_CAP} 条",
+                      file=sys.stderr)
+            shard_rows = []
+            for i, repo in enumerate(iter_pages(results, g.per_page, per_shard)):
+                if i >= per_shard:
+                    break
+                if i % g.per_page == 0:
+                    rate_limit_guard(g)
+                shard_rows.append(_search_repo_row(repo))
+            return shard_rows
+        except GithubException as e:
+            print(f"[warn] search error ({_shard_qualifier(shard_by, lo, hi)}): {e}", file=sys.stderr)
+            return []
+
+    # 分片之间无重叠，但搜索期间 star 数等可能变化，仍按 full_name 去重
+    rows_by_name: Dict[str, Dict[str, Any]] = {}
+    with ThreadPoolExecutor(max_workers=min(GH_WORKERS, len(shards)) or 1) as ex:
+        for shard_rows in ex.map(run_shard, shards):
+            for r in shard_rows:
+                rows_by_name.setdefault(r["full_name"], r)
+
+    key_map = {
+        "stars":   lambda r: r["stargazers_count"] or 0,
+        "forks":   lambda r: r["forks_count"] or 0,
+        "updated": lambda r: r["updated_at"] or datetime.min.replace(tzinfo=timezone.utc),
+    }
+    print(f"[info] {len(shards)} 个初始分片共得到 {len(rows_by_name)} 个仓库", file=sys.stderr)
+    pick = heapq.nlargest if order == "desc" else heapq.nsmallest
+    return pick(limit, rows_by_name.values(), key=key_map.get(sort, key_map["updated"]))
 
 
 # --------- 6) 新增：按组织获取项目列表 ----------
@@ -434,21 +1067,22 @@ def list_repos_for_org(
     include_archived: bool = True,
     sort: str = "updated",           # PyGithub 的 get_repos 支持 sort="updated"/"pushed"/"full_name"（行为以 GitHub 为准）
     limit: int = 500
-) -> List[Dict[str, Any]]:
+) -> Iterator[Dict[str, Any]]:
     """
     列出组织的仓库。若 include_archived=False 将过滤 archived 仓库。
     """
-    rows: List[Dict[str, Any]] = []
     try:
         org_obj = g.get_organization(org)
         repos = org_obj.get_repos(type=repo_type, sort=sort)
-        for i, repo in enumerate(repos):
+        for i, repo in enumerate(iter_pages(repos, g.per_page, limit)):
             if i >= limit:
                 break
-            rate_limit_guard(g)
+            # 每页（一次请求）检查一次即可
+            if i % g.per_page == 0:
+                rate_limit_guard(g)
             if (not include_archived) and repo.archived:
                 continue
-            rows.append({
+            yield {
                 "full_name": repo.full_name,
                 "name": repo.name,
                 "description": repo.description or "",
@@ -460,12 +1094,10 @@ def list_repos_for_org(
                 "updated_at": getattr(repo, "updated_at", ""),
                 "pushed_at": getattr(repo, "pushed_at", ""),
                 "html_url": repo.html_url,
-            })
+            }
     except GithubException as e:
         print(f"[warn] org list error: {e}", file=sys.stderr)
 
-    return rows
-
 
 # --------- 7) 新增：同一作者拥有/Star 的项目列表（合并/可过滤/可排序） ----------
 def list_user_repos(
@@ -483,19 +1115,24 @@ def list_user_repos(
     列出指定用户的 owned / starred 仓库列表。
     统一输出字段，并用 relation 标记来源（"owned"|"starred"）。
     """
-    rows: List[Dict[str, Any]] = []
+    # 以 full_name 为键边收集边去重（同一仓库同时出现在 owned 和 starred 时保留 owned）
+    rows_by_name: Dict[str, Dict[str, Any]] = {}
     u = g.get_user(login)
 
     def add_repo(repo, relation: str):
+        fn = repo.full_name
+        existing = rows_by_name.get(fn)
+        if existing and not (existing["relation"] == "starred" and relation == "owned"):
+            return False
         if (not include_archived) and repo.archived:
             return False
         if (not include_forks) and getattr(repo, "fork", False):
             return False
         if (not include_private) and repo.private:
             return False
-        rows.append({
+        rows_by_name[fn] = {
             "relation": relation,  # "owned" or "starred"
-            "full_name": repo.full_name,
+            "full_name": fn,
             "name": repo.name,
             "owner": repo.owner.login if repo.owner else "",
             "description": repo.description or "",
@@ -507,7 +1144,7 @@ def list_user_repos(
             "updated_at": getattr(repo, "updated_at", ""),
             "pushed_at": getattr(repo, "pushed_at", ""),
             "html_url": repo.html_url,
-        })
+        }
         return True
 
     # owned
@@ -519,7 +1156,8 @@ def list_user_repos(
             # 更激进的提前退出：只需要 limit + 一些缓冲即可
             max_collect = limit + 50 if mode == "both" else limit
             repos=u.get_repos(type="owner", sort="updated")
-            for repo in repos:
+            # 有过滤条件，无法预知需要几页：按批预取，收集够后停止
+            for repo in iter_pages(repos, g.per_page):
                 # 每10次检查一次速率限制，减少检查频率
                 if count % 10 == 0:
                     pass #rate_limit_guard(g)
@@ -534,8 +1172,8 @@ def list_user_repos(
                     print(f"[warn] 跳过仓库 {getattr(repo, 'full_name', 'unknown')}: {e}", file=sys.stderr)
                     continue
                 # 提前退出：如果已经收集足够多，立即停止
-                if len(rows) >= max_collect:
-                    print(f"[info] 已收集 {len(rows)} 个仓库（目标: {limit}），提前停止 owned 收集", file=sys.stderr)
+                if len(rows_by_name) >= max_collect:
+                    print(f"[info] 已收集 {len(rows_by_name)} 个仓库（目标: {limit}），提前停止 owned 收集", file=sys.stderr)
                     break
             print(f"[info] owned 仓库处理完成，共处理 {count} 个，添加 {owned_count} 个", file=sys.stderr)
         except Exception as e:
@@ -554,7 +1192,7 @@ def list_user_repos(
             
             # get_starred() 服务端没有 stars 排序；我们在本地统一排序
             repos=u.get_starred()
-            for repo in repos:
+            for repo in iter_pages(repos, g.per_page, max_process):
                 # 每10次检查一次速率限制
                 if count % 10 == 0:
                     pass #rate_limit_guard(g)
@@ -569,8 +1207,8 @@ def list_user_repos(
                     print(f"[warn] 跳过仓库 {getattr(repo, 'full_name', 'unknown')}: {e}", file=sys.stderr)
                     continue
                 # 提前退出：如果已经收集足够多或处理太多，立即停止
-                if len(rows) >= max_collect:
-                    print(f"[info] 已收集 {len(rows)} 个仓库（目标: {limit}），提前停止 starred 收集", file=sys.stderr)
+                if len(rows_by_name) >= max_collect:
+                    print(f"[info] 已收集 {len(rows_by_name)} 个仓库（目标: {limit}），提前停止 starred 收集", file=sys.stderr)
                     break
                 if count >= max_process:
                     print(f"[info] 已处理 {count} 个仓库（达到上限 {max_process}），提前停止 starred 收集", file=sys.stderr)
@@ -579,23 +1217,8 @@ def list_user_repos(
         except Exception as e:
             print(f"[error] 获取 starred 仓库时出错: {e}", file=sys.stderr)
 
-    print(f"[info] 开始排序和去重，当前有 {len(rows)} 条记录", file=sys.stderr)
-    
-    # 去重（如果同一个仓库同时出现在 owned 和 starred，保留 owned）
-    # 使用字典记录索引，避免 index() 查找
-    seen = {}
-    unique_rows = []
-    for r in rows:
-        full_name = r["full_name"]
-        if full_name not in seen:
-            seen[full_name] = len(unique_rows)  # 记录索引位置
-            unique_rows.append(r)
-        elif unique_rows[seen[full_name]]["relation"] == "starred" and r["relation"] == "owned":
-            # 如果已存在的是 starred，新的是 owned，替换
-            unique_rows[seen[full_name]] = r
-    
-    rows = unique_rows
-    print(f"[info] 去重后剩余 {len(rows)} 条记录", file=sys.stderr)
+    rows = list(rows_by_name.values())
+    print(f"[info] 去重后共 {len(rows)} 条记录，开始排序", file=sys.stderr)
 
     # 本地排序
     key_map = {
@@ -605,12 +1228,14 @@ def list_user_repos(
         "stars":      lambda r: r["stargazers_count"] or 0,
     }
     keyfunc = key_map.get(sort, key_map["updated"])
-    rows.sort(key=keyfunc, reverse=(order == "desc"))
 
-    # 限量（both 模式下合并后再截断）
+    # 限量（both 模式下合并后再截断）：需要截断时用堆只取前 limit 条，结果与先排序再切片相同
     if len(rows) > limit:
-        rows = rows[:limit]
+        pick = heapq.nlargest if order == "desc" else heapq.nsmallest
+        rows = pick(limit, rows, key=keyfunc)
         print(f"[info] 截断到 {limit} 条记录", file=sys.stderr)
+    else:
+        rows.sort(key=keyfunc, reverse=(order == "desc"))
     
     print(f"[info] 最终返回 {len(rows)} 条记录", file=sys.stderr)
     return rows
@@ -619,6 +1244,10 @@ def list_user_repos(
 # --------- CLI ---------
 def main():
     ap = argparse.ArgumentParser(description="GitHub 活动抓取/汇总（PyGithub）")
+    ap.add_argument("--no-cache", action="store_true",
+                    help=f"不使用 REST 响应的 ETag 缓存（缓存位置: {ETAG_CACHE_PATH}），也不写入提交明细缓存")
+    ap.add_argument("--cache-only", action="store_true",
+                    help=f"cross-repos / repo-authors 只从提交明细缓存（{COMMIT_ROWS_CACHE_PATH}）导出，不访问 GitHub")
     sub = ap.add_subparsers(dest="mode", required=True)
 
     # 1) 跨仓：不同仓库同一作者（明细）
@@ -630,6 +1259,7 @@ def main():
     s1.add_argument("--owner", help="枚举此 owner 的仓库（用户或组织）。不填则默认枚举 author-login 的仓库")
     s1.add_argument("--repo-type", default="owner", choices=["all","owner","member","public","private"])
     s1.add_argument("--max-per-repo", type=int, default=1000)
+    s1.add_argument("--include-archived", action="store_true", help="包含 archived 仓库（默认跳过）")
     s1.add_argument("--out", default="cross_repos.csv")
 
     # 2) 单仓：同一仓库不同作者（明细）
@@ -651,6 +1281,7 @@ def main():
     s3.add_argument("--owner", help="枚举此 owner 的仓库（用户或组织）。不填则默认枚举 author-login 的仓库")
     s3.add_argument("--repo-type", default="owner", choices=["all","owner","member","public","private"])
     s3.add_argument("--min-commits", type=int, default=1, help="最小提交数阈值")
+    s3.add_argument("--include-archived", action="store_true", help="包含 archived 仓库（默认跳过）")
     s3.add_argument("--out", default="repos_by_author.csv")
 
     # 4) 新增：同一仓库不同作者（作者列表）
@@ -673,6 +1304,8 @@ def main():
     s5.add_argument("--sort", choices=["updated","stars","forks"], default="updated")
     s5.add_argument("--order", choices=["desc","asc"], default="desc")
     s5.add_argument("--limit", type=int, default=200, help="最多返回条数")
+    s5.add_argument("--shard-by", choices=["stars","pushed"],
+                    help="按 star 数或推送日期拆分查询，突破 Search API 的 1000 条上限")
     s5.add_argument("--out", default="search_repos.csv")
 
     # 6) org-repos：按组织列出项目
@@ -700,32 +1333,69 @@ def main():
 
     args = ap.parse_args()
 
-    g = gh_client()
+    if args.cache_only and args.mode not in ("cross-repos", "repo-authors"):
+        ap.error("--cache-only 仅支持 cross-repos / repo-authors")
+    if args.cache_only and args.no_cache:
+        ap.error("--cache-only 与 --no-cache 不能同时使用")
+
+    # --cache-only 不访问 GitHub，无需客户端
+    g = None if args.cache_only else gh_client(use_cache=not args.no_cache)
     since = parse_dt(args.since) if hasattr(args, "since") else None
     until = parse_dt(args.until) if hasattr(args, "until") else None
+    rows_cache = commit_rows_cache_open() if args.mode in ("cross-repos", "repo-authors") and not args.no_cache else None
+    if args.cache_only and rows_cache is None:
+        sys.exit(1)
 
     if args.mode == "cross-repos":
-        rows = fetch_user_activity_across_repos(
-            g=g,
-            author_login=args.author_login,
-            author_email=args.author_email,
-            since=since, until=until,
-            owner=args.owner,
-            repo_type=args.repo_type,
-            max_per_repo=args.max_per_repo,
-        )
+        if args.cache_only:
+            # 离线时无法枚举作者的仓库：未指定 --owner 则在全部已缓存仓库中查找
+            rows = cached_commit_rows(
+                rows_cache,
+                owner=args.owner,
+                authors_login=[args.author_login] if args.author_login else None,
+                authors_emails=[args.author_email] if args.author_email else None,
+                match_all=True,
+                since=since, until=until,
+                max_per_key=args.max_per_repo,
+            )
+        else:
+            rows = fetch_user_activity_across_repos(
+                g=g,
+                author_login=args.author_login,
+                author_email=args.author_email,
+                since=since, until=until,
+                owner=args.owner,
+                repo_type=args.repo_type,
+                max_per_repo=args.max_per_repo,
+                include_archived=args.include_archived,
+            )
+            if rows_cache is not None:
+                rows = store_commit_rows(rows, rows_cache)
         keys = ["repo","sha","date","author_login","author_name","author_email","committer_login","title","url"]
         write_csv(rows, args.out, keys)
 
     elif args.mode == "repo-authors":
-        rows = fetch_repo_activity_across_authors(
-            g=g,
-            repo_full=args.repo_full,
-            authors_login=args.authors_login,
-            authors_emails=args.authors_emails,
-            since=since, until=until,
-            max_per_author=args.max_per_author,
-        )
+        if args.cache_only:
+            # 与在线抓取一致：给了邮箱时 login 阶段的结果也须匹配邮箱，最终等价于只按邮箱过滤
+            rows = cached_commit_rows(
+                rows_cache,
+                repo_full=args.repo_full,
+                authors_login=None if args.authors_emails else args.authors_login,
+                authors_emails=args.authors_emails,
+                since=since, until=until,
+                max_per_key=args.max_per_author if (args.authors_login or args.authors_emails) else None,
+            )
+        else:
+            rows = fetch_repo_activity_across_authors(
+                g=g,
+                repo_full=args.repo_full,
+                authors_login=args.authors_login,
+                authors_emails=args.authors_emails,
+                since=since, until=until,
+                max_per_author=args.max_per_author,
+            )
+            if rows_cache is not None:
+                rows = store_commit_rows(rows, rows_cache)
         keys = ["repo","sha","date","author_login","author_name","author_email","committer_login","title","url"]
         write_csv(rows, args.out, keys)
 
@@ -737,7 +1407,8 @@ def main():
             since=since, until=until,
             owner=args.owner,
             repo_type=args.repo_type,
-            min_commits=args.min_commits
+            min_commits=args.min_commits,
+            include_archived=args.include_archived
         )
         keys = ["repo","commits"]
         write_csv(rows, args.out, keys)
@@ -764,7 +1435,8 @@ def main():
             owner=args.owner,
             sort=args.sort,
             order=args.order,
-            limit=args.limit
+            limit=args.limit,
+            shard_by=args.shard_by
         )
         keys = ["full_name","name","owner","description","language","stargazers_count",
                 "forks_count","archived","private","updated_at","pushed_at","html_url"]